@@ -1,6 +1,20 @@
+import os
+import sys
+import json
+import base64
+import asyncio
 import argparse
 import requests
-import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent / "k8s"))
+from kube_client import configure, API_URL, VERIFY
+
+FIELD_MANAGER = "create-secret"
+MANAGED_LABEL = "app.kubernetes.io/managed-by"
+# Written by earlier versions; dropped on the next apply.
+LEGACY_HASH_ANNOTATION = "create-secret/data-hash"
+WORKERS = max(1, int(os.getenv("SECRET_WORKERS", "16")))
 
 
 def parse_key_values(pairs):
@@ -13,44 +27,181 @@ def parse_key_values(pairs):
     return data
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Create Kubernetes Secret via Kubernetes API (kubectl proxy)"
-    )
+def parse_env_file(path):
+    data = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("export "):
+            line = line[len("export "):]
+        k, sep, v = line.partition("=")
+        if not sep:
+            raise SystemExit(f"Invalid line in {path}: {line}")
+        v = v.strip()
+        if len(v) >= 2 and v[0] == v[-1] and v[0] in "\"'":
+            v = v[1:-1]
+        data[k.strip()] = v
+    return data
 
-    parser.add_argument("--api-url", required=True, help="Kubernetes API URL (via kubectl proxy)")
-    parser.add_argument("--namespace", required=True, help="Kubernetes namespace")
-    parser.add_argument("--name", required=True, help="Secret name")
-    parser.add_argument("--key", action="append", required=True, help="key=value")
 
-    args = parser.parse_args()
+def load_manifest(path):
+    # A YAML/JSON list of {namespace, name, type?, data}, optionally under a
+    # "secrets" key, or a directory laid out as <namespace>/<name>.env.
+    path = Path(path)
+    if path.is_dir():
+        return [
+            {"namespace": env.parent.name, "name": env.stem, "data": parse_env_file(env)}
+            for env in sorted(path.glob("*/*.env"))
+        ]
 
-    secret_data = parse_key_values(args.key)
+    with path.open("r", encoding="utf-8") as f:
+        if path.suffix in (".yaml", ".yml"):
+            import yaml
+            manifest = yaml.safe_load(f)
+        else:
+            manifest = json.load(f)
 
-    secret_payload = {
+    secrets = manifest.get("secrets", []) if isinstance(manifest, dict) else manifest
+    for s in secrets:
+        if not s.get("namespace") or not s.get("name"):
+            raise SystemExit(f"Secret entry needs a namespace and a name: {s}")
+        s["data"] = s.get("data") or {}
+        for k, v in s["data"].items():
+            # YAML turns true, 0755 or 1.50 into other values; quote them.
+            if not isinstance(v, str):
+                raise SystemExit(f"{s['namespace']}/{s['name']}: value of '{k}' must be a quoted string, "
+                                 f"got {type(v).__name__} {v!r}")
+    return secrets
+
+
+def secret_body(secret):
+    return {
         "apiVersion": "v1",
         "kind": "Secret",
         "metadata": {
-            "name": args.name,
-            "namespace": args.namespace,
+            "name": secret["name"],
+            "namespace": secret["namespace"],
+            "labels": {MANAGED_LABEL: FIELD_MANAGER},
         },
-        "type": "Opaque",
-        "stringData": secret_data,
+        "type": secret.get("type", "Opaque"),
+        "data": {k: base64.b64encode(v.encode("utf-8")).decode("ascii") for k, v in secret["data"].items()},
     }
 
-    url = f"{args.api_url}/api/v1/namespaces/{args.namespace}/secrets"
 
-    headers = {
-        "Content-Type": "application/json",
-    }
+def live_state(item):
+    # What apply would set; secrets still carrying the old plaintext-hash
+    # annotation never compare equal, so the next apply removes it.
+    if LEGACY_HASH_ANNOTATION in item["metadata"].get("annotations", {}):
+        return None
+    return item.get("type", "Opaque"), item.get("data") or {}
 
-    resp = requests.post(url, json=secret_payload, headers=headers)
 
-    if resp.status_code >= 300:
-        print(f"ERROR {resp.status_code}: {resp.text}")
-        sys.exit(1)
+def namespace_secrets(client, namespace):
+    # One (paginated) list of the secrets this script manages in a namespace.
+    # Without list permission every secret is simply applied.
+    live = {}
+    try:
+        for page in client.iter_pages(
+            f"/api/v1/namespaces/{namespace}/secrets",
+            params={"labelSelector": f"{MANAGED_LABEL}={FIELD_MANAGER}"},
+        ):
+            for item in page.get("items", []):
+                live[(namespace, item["metadata"]["name"])] = live_state(item)
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code != 403:
+            raise
+        print(f"No permission to list secrets in '{namespace}', applying all of them")
+        return {}
+    return live
+
+
+def existing_secrets(client, namespaces, workers):
+    live = {}
+
+    async def run():
+        async for namespace, found, error in client.fan_out(lambda ns: namespace_secrets(client, ns), namespaces, workers):
+            if error is not None:
+                print(f"Could not list secrets in '{namespace}', applying all of them: {error}")
+            else:
+                live.update(found)
+
+    asyncio.run(run())
+    return live
+
 
-    print(f"Secret '{args.name}' created successfully in namespace '{args.namespace}'")
+def apply_secret(client, body):
+    # Server-side apply creates the secret or updates the fields we own.
+    meta = body["metadata"]
+    r = client.patch(
+        f"/api/v1/namespaces/{meta['namespace']}/secrets/{meta['name']}",
+        body,
+        content_type="application/apply-patch+yaml",
+        params={"fieldManager": FIELD_MANAGER, "force": "true"},
+        idempotent=True,
+    )
+    if r.status_code >= 300:
+        raise RuntimeError(f"{r.status_code}: {r.text}")
+    return "created" if r.status_code == 201 else "updated"
+
+
+def apply_all(client, secrets, workers):
+    # Compared with the live type and data, so no digest of the plaintext has
+    # to be stored on the object.
+    current = existing_secrets(client, sorted({s["namespace"] for s in secrets}), workers)
+    todo, results = [], {"created": 0, "updated": 0, "unchanged": 0, "failed": 0}
+
+    for secret in secrets:
+        body = secret_body(secret)
+        if current.get((secret["namespace"], secret["name"])) == (body["type"], body["data"]):
+            results["unchanged"] += 1
+        else:
+            todo.append(body)
+
+    async def run():
+        async for body, outcome, error in client.fan_out(lambda b: apply_secret(client, b), todo, workers):
+            label = f"{body['metadata']['namespace']}/{body['metadata']['name']}"
+            if error is not None:
+                print(f"ERROR {label}: {error}")
+                results["failed"] += 1
+            else:
+                print(f"Secret '{label}' {outcome}")
+                results[outcome] += 1
+
+    asyncio.run(run())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create or update Kubernetes Secrets via Kubernetes API (kubectl proxy)"
+    )
+
+    parser.add_argument("--api-url", default=API_URL, help="Kubernetes API URL (via kubectl proxy)")
+    parser.add_argument("--namespace", help="Kubernetes namespace")
+    parser.add_argument("--name", help="Secret name")
+    parser.add_argument("--key", action="append", default=[], help="key=value")
+    parser.add_argument("--manifest", help="YAML/JSON list of secrets, or a <namespace>/<name>.env directory")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="concurrent requests in bulk mode")
+    parser.add_argument("--ca-cert", help="CA bundle for the API server's certificate (default: KUBE_CA_CERT)")
+    parser.add_argument("--insecure", action="store_true", help="skip TLS verification (default: KUBE_INSECURE)")
+
+    args = parser.parse_args()
+
+    if args.manifest:
+        secrets = load_manifest(args.manifest)
+    elif args.namespace and args.name and args.key:
+        secrets = [{"namespace": args.namespace, "name": args.name, "data": parse_key_values(args.key)}]
+    else:
+        parser.error("either --manifest or --namespace, --name and --key are required")
+
+    client = configure(args.api_url, verify=False if args.insecure else args.ca_cert or VERIFY)
+    results = apply_all(client, secrets, args.workers)
+
+    print(", ".join(f"{v} {k}" for k, v in results.items()))
+
+    if results["failed"]:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
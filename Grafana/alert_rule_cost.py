@@ -0,0 +1,211 @@
+import os
+import sys
+import gzip
+import json
+import argparse
+from collections import defaultdict
+from pathlib import Path
+
+from unused_metrics import (
+    api_get, parse_selectors, selector_series, selector_samples, fetch_series_counts,
+)
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from request.grafana_api_client import default_client
+from alertrule import rule_fields, rule_interval
+
+# Estimates how much Prometheus load each exported alert rule generates:
+#
+#   python Grafana/export_AlertRule.py
+#   python Grafana/alert_rule_cost.py --dir grafana_alert_rules
+#
+# Reads either export layout (one JSON file per rule, or GRAFANA_RULES_PACKED
+# namespace packs); with --layout auto the packs win when both are present, so
+# a directory written in both modes is not counted twice. Series counts for every referenced metric come from
+# batched count-by-name queries through the datasource proxy; label matchers
+# and range windows are applied with the heuristics in unused_metrics.py.
+# Rules and groups are ranked by queries/sec × series touched.
+
+DEFAULT_INTERVAL = int(os.getenv("GRAFANA_RULE_GROUP_INTERVAL", "60"))
+
+
+def iter_packed_rules(directory: Path):
+    for path in sorted(directory.glob("*.ndjson.gz")):
+        namespace = path.name[:-len(".ndjson.gz")]
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                group = json.loads(line)
+                interval = rule_interval(group)
+                for rule in group.get("rules", []):
+                    yield namespace, group.get("name"), interval, rule
+
+
+def iter_rule_files(directory: Path):
+    for path in sorted(directory.glob("*.json")):
+        if path.name.startswith("."):
+            continue
+        with path.open("r", encoding="utf-8") as f:
+            rule = json.load(f)
+        fields = rule_fields(rule)
+        namespace = fields.get("namespace_uid") or fields.get("folderUID") or fields.get("folderName")
+        yield namespace, fields.get("rule_group") or fields.get("ruleGroup"), None, rule
+
+
+def iter_exported_rules(directory: Path, layout: str = "auto"):
+    # Yields (namespace, group, group interval or None, rule), each rule uid
+    # once (a renamed rule can leave an older per-rule file behind).
+    if layout == "auto":
+        layout = "packs" if any(directory.glob("*.ndjson.gz")) else "files"
+    seen = set()
+    for namespace, group, interval, rule in (iter_packed_rules if layout == "packs" else iter_rule_files)(directory):
+        uid = rule_fields(rule).get("uid")
+        if uid:
+            if uid in seen:
+                continue
+            seen.add(uid)
+        yield namespace, group, interval, rule
+
+
+def range_steps(query: dict) -> float:
+    # Range-mode alert queries are evaluated at every step of relativeTimeRange.
+    model = query.get("model", {})
+    if not model.get("range") or model.get("instant"):
+        return 1.0
+    window = query.get("relativeTimeRange", {})
+    span = float(window.get("from", 600)) - float(window.get("to", 0))
+    step = max(model.get("intervalMs", 1000) / 1000, span / model.get("maxDataPoints", 43200))
+    return span / step + 1
+
+
+def prometheus_queries(fields: dict, datasources: dict):
+    for query in fields.get("data", []):
+        ds = datasources.get(query.get("datasourceUid"))
+        expr = query.get("model", {}).get("expr")
+        if ds is not None and expr:
+            yield ds["id"], query, parse_selectors(expr)
+
+
+def load_rules(directory: Path, datasources: dict, layout: str = "auto") -> list:
+    rules = []
+    for namespace, group, group_interval, rule in iter_exported_rules(directory, layout):
+        fields = rule_fields(rule)
+        if fields.get("isPaused"):
+            continue
+        rules.append({
+            "uid": fields.get("uid"),
+            "title": fields.get("title"),
+            "namespace": namespace,
+            "group": group,
+            "interval": rule_interval(fields) or group_interval or DEFAULT_INTERVAL,
+            "queries": list(prometheus_queries(fields, datasources)),
+        })
+    return rules
+
+
+def fetch_counts(rules: list) -> dict:
+    # {datasource id: {metric: series}}, one batch of queries per datasource.
+    metrics = defaultdict(set)
+    for rule in rules:
+        for ds_id, _, selectors in rule["queries"]:
+            metrics[ds_id].update(s.metric for s in selectors if s.metric)
+    return {ds_id: fetch_series_counts(ds_id, names) for ds_id, names in metrics.items()}
+
+
+def rule_cost(rule: dict, counts: dict) -> dict:
+    series = samples = 0.0
+    unbounded = 0
+    for ds_id, query, selectors in rule["queries"]:
+        steps = range_steps(query)
+        for s in selectors:
+            series += selector_series(s, counts[ds_id])
+            samples += selector_samples(s, counts[ds_id]) * steps
+            unbounded += s.metric is None
+
+    qps = len(rule["queries"]) / rule["interval"]
+    return {
+        "uid": rule["uid"],
+        "title": rule["title"],
+        "namespace": rule["namespace"],
+        "group": rule["group"],
+        "interval_seconds": rule["interval"],
+        "queries_per_sec": round(qps, 4),
+        "series_touched": round(series),
+        "samples_per_sec": round(samples / rule["interval"], 1),
+        "nameless_selectors": unbounded,
+        "score": round(qps * series, 2),
+    }
+
+
+def group_costs(rules: list) -> list:
+    groups = {}
+    for r in rules:
+        key = (r["namespace"], r["group"])
+        g = groups.setdefault(key, {"namespace": key[0], "group": key[1], "rules": 0, "queries_per_sec": 0.0,
+                                    "series_touched": 0, "samples_per_sec": 0.0, "score": 0.0})
+        g["rules"] += 1
+        for field in ("queries_per_sec", "series_touched", "samples_per_sec", "score"):
+            g[field] += r[field]
+
+    for g in groups.values():
+        g["queries_per_sec"] = round(g["queries_per_sec"], 4)
+        g["samples_per_sec"] = round(g["samples_per_sec"], 1)
+        g["score"] = round(g["score"], 2)
+    return sorted(groups.values(), key=lambda g: -g["score"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank exported alert rules by estimated Prometheus cost")
+    parser.add_argument("--dir", default="grafana_alert_rules", help="export_AlertRule.py output directory")
+    parser.add_argument("--layout", choices=["auto", "packs", "files"], default="auto",
+                        help="export layout to read (auto: packs when present, else per-rule files)")
+    parser.add_argument("--output", default="alert_rule_cost_report.json")
+    parser.add_argument("--top", type=int, default=10, help="rules and groups to print")
+    args = parser.parse_args()
+
+    default_client()
+
+    datasources = {ds["uid"]: ds for ds in api_get("/api/datasources") if ds["type"] == "prometheus"}
+
+    print(f"Loading rules from {args.dir}...")
+    rules = load_rules(Path(args.dir), datasources, args.layout)
+
+    print(f"Counting series for {len(rules)} rules...")
+    counts = fetch_counts(rules)
+
+    costs = sorted((rule_cost(r, counts) for r in rules), key=lambda r: (-r["score"], r["uid"] or ""))
+    groups = group_costs(costs)
+
+    report = {
+        "summary": {
+            "rules": len(costs),
+            "groups": len(groups),
+            "queries_per_sec": round(sum(r["queries_per_sec"] for r in costs), 3),
+            "samples_per_sec": round(sum(r["samples_per_sec"] for r in costs), 1),
+            "score": round(sum(r["score"] for r in costs), 2),
+        },
+        "groups": groups,
+        "rules": costs,
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print("\n--- SUMMARY ---")
+    for k, v in report["summary"].items():
+        print(f"{k}: {v}")
+
+    print("\n--- TOP GROUPS BY SCORE ---")
+    for g in groups[:args.top]:
+        print(f"{g['score']:>12}  {g['rules']:>4} rules  {g['namespace']}/{g['group']}")
+
+    print("\n--- TOP RULES BY SCORE ---")
+    for r in costs[:args.top]:
+        print(f"{r['score']:>12}  {r['series_touched']:>8} series  every {r['interval_seconds']:g}s  {r['title']}")
+
+    print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
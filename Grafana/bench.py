@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+from fake_grafana import FakeGrafana
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from request.fake_server import run_script as run_script_file
+
+# Throughput benchmark for the Grafana scripts, run offline against
+# fake_grafana.py. Each script runs as a subprocess in a scratch directory,
+# so peak RSS and wall time are measured per script:
+#
+#   python Grafana/bench.py --dashboards 2000 --rules 2000 --latency-ms 20
+#   python Grafana/bench.py --scripts export_dashboard --env GRAFANA_EXPORT_WORKERS=16
+
+HERE = Path(__file__).resolve().parent
+
+SCENARIOS = {
+    "export_dashboard": {"items": "dashboards", "env": {"GRAFANA_DASH_OUT": "dashboards"}},
+    "import_dashboard": {"items": "dashboards", "env": {"GRAFANA_DASH_DIR": "dashboards"}},
+    "export_AlertRule": {"items": "rules", "env": {}},
+    "import_AlertRule": {"items": "rules", "env": {}},
+    "unused_metrics": {"items": "dashboards", "env": {}},
+}
+
+
+def write_rule_files(fake: FakeGrafana, workdir: Path):
+    # import_AlertRule.py reads provisioning-style files with a folderName.
+    titles = {uid: title for title, uid in fake.folders.items()}
+    target = workdir / "alert_rules_to_upload"
+    shutil.rmtree(target, ignore_errors=True)
+    shutil.rmtree(workdir / "alert_rules_uploaded", ignore_errors=True)
+    target.mkdir()
+
+    for (folder_uid, _), entry in fake.groups.items():
+        for rule in entry["rules"]:
+            data = {k: v for k, v in rule.items() if k != "folderUID"}
+            data["folderName"] = titles[folder_uid]
+            (target / f"{rule['uid']}.json").write_text(json.dumps(data))
+
+
+def run_script(name: str, env: dict, workdir: Path) -> tuple:
+    return run_script_file(HERE / f"{name}.py", [], env, workdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Grafana scripts against a fake Grafana")
+    parser.add_argument("--dashboards", type=int, default=500)
+    parser.add_argument("--rules", type=int, default=500)
+    parser.add_argument("--metrics", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--scripts", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE for the scripts")
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    args = parser.parse_args()
+
+    fake = FakeGrafana(args.dashboards, args.rules, args.metrics, args.latency_ms, args.error_rate)
+    server = fake.serve()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    workdir = Path(tempfile.mkdtemp(prefix="grafana-bench-"))
+
+    base_env = dict(os.environ, GRAFANA_URL=url, GRAFANA_TOKEN="bench")
+    for item in args.env:
+        key, _, value = item.partition("=")
+        base_env[key] = value
+
+    counts = {"dashboards": args.dashboards, "rules": args.rules}
+    results = []
+
+    try:
+        for name in args.scripts:
+            scenario = SCENARIOS[name]
+
+            if name == "import_dashboard" and not (workdir / "dashboards").exists():
+                run_script("export_dashboard", dict(base_env, **SCENARIOS["export_dashboard"]["env"]), workdir)
+            if name == "import_AlertRule":
+                write_rule_files(fake, workdir)
+            if name == "unused_metrics":
+                (workdir / "metric_usage.db").unlink(missing_ok=True)
+
+            fake.reset_stats()
+            code, elapsed, rss_mb, stderr = run_script(name, dict(base_env, **scenario["env"]), workdir)
+            stats = fake.stats()
+
+            items = counts[scenario["items"]]
+            results.append({
+                "script": name,
+                "exit_code": code,
+                "seconds": round(elapsed, 3),
+                "items": items,
+                "items_per_sec": round(items / elapsed, 1) if elapsed else 0.0,
+                "requests": stats["requests"],
+                "p50_ms": stats["p50_ms"],
+                "p99_ms": stats["p99_ms"],
+                "peak_rss_mb": round(rss_mb, 1),
+            })
+            if code != 0:
+                print(f"{name} exited with {code}:\n{stderr}", file=sys.stderr)
+    finally:
+        server.shutdown()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{args.dashboards} dashboards, {args.rules} rules, {args.metrics} metrics, "
+          f"{args.latency_ms}ms latency, {args.error_rate:.0%} errors")
+    header = f"{'script':<18} {'sec':>8} {'items/s':>9} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'rss MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['script']:<18} {r['seconds']:>8} {r['items_per_sec']:>9} {r['requests']:>9} "
+              f"{r['p50_ms']:>8} {r['p99_ms']:>8} {r['peak_rss_mb']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.keep:
+        print(f"\nScratch directory kept at {workdir}")
+
+
+if __name__ == "__main__":
+    main()
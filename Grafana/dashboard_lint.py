@@ -0,0 +1,242 @@
+import os
+import sys
+import csv
+import io
+import json
+import asyncio
+import argparse
+from pathlib import Path
+
+from unused_metrics import (
+    iter_targets, iter_panels, parse_selectors, selector_series, selector_samples,
+    api_get, get_default_prometheus_ds_id, fetch_series_counts,
+)
+from export_dashboard import iter_dashboards, fetch_dashboard_by_uid
+from import_dashboard import load_dashboard_json
+from dashboard_pack import PackReader
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from request.grafana_api_client import default_client
+from request.grafana_common import parse_duration
+
+# Estimates the Prometheus load each dashboard generates and flags the worst:
+#
+#   python Grafana/dashboard_lint.py                       # live, via GRAFANA_URL
+#   python Grafana/dashboard_lint.py --dir grafana_dashboards
+#   python Grafana/dashboard_lint.py --pack backup.gdpack --sort queries_per_min
+#
+# queries/min is the number of visible targets times the refresh rate;
+# dashboards without auto-refresh are assumed to be reloaded every
+# VIEW_INTERVAL seconds. The score is samples scanned per minute: series per
+# selector (after matcher selectivity) times the samples in its range window.
+# Series counts come from the default Prometheus datasource even when reading
+# an export; with --offline every metric is assumed to have ASSUMED_SERIES.
+# Only Prometheus targets are scored. A datasource reference without a type
+# is resolved through /api/datasources; with --offline, untyped references
+# (and targets on the default datasource) are assumed to be Prometheus.
+
+WORKERS = max(1, int(os.getenv("GRAFANA_EXPORT_WORKERS", "8")))
+VIEW_INTERVAL = float(os.getenv("DASHBOARD_LINT_VIEW_INTERVAL", "300"))
+ASSUMED_SERIES = int(os.getenv("DASHBOARD_LINT_ASSUMED_SERIES", "100"))
+
+MIN_REFRESH = 30
+MAX_PANELS = 30
+LONG_RANGE = 3600
+
+MIXED = "-- Mixed --"
+
+COLUMNS = ["uid", "title", "panels", "queries", "refresh", "queries_per_min", "series_per_load", "score", "flags"]
+
+
+def fetch_live_dashboards() -> list:
+    client = default_client()
+    uids = [d["uid"] for d in iter_dashboards(client=client)]
+
+    async def run():
+        dashboards = []
+        async for uid, payload, error in client.fan_out(fetch_dashboard_by_uid, uids, WORKERS):
+            if error is not None:
+                print(f"Failed: {uid} → {error}", file=sys.stderr)
+            elif payload is not None:
+                dashboards.append(payload["dashboard"])
+        return dashboards
+
+    return asyncio.run(run())
+
+
+def iter_dir_dashboards(directory: Path):
+    for path in sorted(directory.glob("*.json")):
+        if not path.name.startswith("."):
+            yield load_dashboard_json(path)
+
+
+def iter_pack_dashboards(path: Path):
+    with PackReader(path) as pack:
+        for uid in pack.uids():
+            payload = pack.get(uid)
+            yield payload.get("dashboard", payload)
+
+
+def refresh_seconds(dashboard: dict):
+    refresh = dashboard.get("refresh")
+    if not refresh or not isinstance(refresh, str):
+        return None
+    try:
+        return parse_duration(refresh) or None
+    except ValueError:
+        return None
+
+
+def fetch_datasource_types() -> dict:
+    # {uid or name: type}; None maps to the default datasource's type.
+    types = {}
+    for ds in api_get("/api/datasources"):
+        types[ds["uid"]] = types[ds["name"]] = ds["type"]
+        if ds.get("isDefault"):
+            types[None] = ds["type"]
+    return types
+
+
+def is_prometheus(panel: dict, target: dict, types: dict) -> bool:
+    ref = target.get("datasource") or panel.get("datasource")
+    if isinstance(ref, dict):
+        if ref.get("type") and ref["type"] != "datasource":
+            return ref["type"] == "prometheus"
+        ref = ref.get("uid")
+    if ref == MIXED:
+        ref = None
+    return types.get(ref, "prometheus") == "prometheus"
+
+
+def dashboard_selectors(dashboard: dict, types: dict):
+    # Yields the selectors of every visible Prometheus target.
+    for panel, target in iter_targets(dashboard):
+        if target.get("hide") or not target.get("expr") or not is_prometheus(panel, target, types):
+            continue
+        yield parse_selectors(target["expr"])
+
+
+def lint_dashboard(dashboard: dict, series: dict, types: dict) -> dict:
+    panels = sum(1 for p in iter_panels(dashboard.get("panels", [])) if p.get("type") != "row")
+    refresh = refresh_seconds(dashboard)
+    loads_per_min = 60 / (refresh or VIEW_INTERVAL)
+
+    queries = unfiltered = long_ranges = nameless = 0
+    series_per_load = samples_per_load = 0.0
+    for selectors in dashboard_selectors(dashboard, types):
+        queries += 1
+        for s in selectors:
+            series_per_load += selector_series(s, series)
+            samples_per_load += selector_samples(s, series)
+            nameless += s.metric is None
+            unfiltered += s.metric is not None and not any(m[0] != "__name__" for m in s.matchers)
+            long_ranges += (s.range_seconds or 0) >= LONG_RANGE
+
+    flags = []
+    if refresh and refresh < MIN_REFRESH:
+        flags.append(f"refresh {dashboard['refresh']}")
+    if panels > MAX_PANELS:
+        flags.append(f"{panels} panels")
+    if unfiltered:
+        flags.append(f"{unfiltered} selectors without label matchers")
+    if long_ranges:
+        flags.append(f"{long_ranges} ranges >= {LONG_RANGE // 3600}h")
+    if nameless:
+        flags.append(f"{nameless} selectors without a metric name")
+
+    return {
+        "uid": dashboard.get("uid"),
+        "title": dashboard.get("title"),
+        "panels": panels,
+        "queries": queries,
+        "refresh": dashboard.get("refresh") or "",
+        "queries_per_min": round(queries * loads_per_min, 2),
+        "series_per_load": round(series_per_load),
+        "score": round(samples_per_load * loads_per_min),
+        "flags": flags,
+    }
+
+
+def load_series_counts(dashboards: list, types: dict, offline: bool) -> dict:
+    metrics = {
+        s.metric for d in dashboards for selectors in dashboard_selectors(d, types) for s in selectors if s.metric
+    }
+    if offline:
+        return dict.fromkeys(metrics, ASSUMED_SERIES)
+    return fetch_series_counts(get_default_prometheus_ds_id(), metrics)
+
+
+def format_report(results: list, fmt: str) -> str:
+    if fmt == "json":
+        return json.dumps(results, indent=2) + "\n"
+
+    if fmt == "csv":
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=COLUMNS)
+        writer.writeheader()
+        for r in results:
+            writer.writerow({**r, "flags": "; ".join(r["flags"])})
+        return out.getvalue()
+
+    lines = [f"{'score':>12} {'q/min':>8} {'series':>8} {'panels':>6} {'refresh':>7}  dashboard"]
+    for r in results:
+        lines.append(f"{r['score']:>12} {r['queries_per_min']:>8} {r['series_per_load']:>8} "
+                     f"{r['panels']:>6} {r['refresh']:>7}  {r['title']} ({r['uid']})")
+        lines.extend(f"{'':>12} ! {flag}" for flag in r["flags"])
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate Prometheus query load per dashboard")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--dir", help="export_dashboard.py output directory (default: live Grafana)")
+    source.add_argument("--pack", help="dashboard pack written with GRAFANA_DASH_PACK")
+    parser.add_argument("--offline", action="store_true",
+                        help=f"do not query Prometheus; assume {ASSUMED_SERIES} series per metric")
+    parser.add_argument("--sort", choices=["score", "queries_per_min", "series_per_load", "panels", "title"],
+                        default="score")
+    parser.add_argument("--max-score", type=float, help="also flag dashboards scoring above this")
+    parser.add_argument("--top", type=int, help="only report the first N dashboards")
+    parser.add_argument("--format", choices=["text", "json", "csv"], default="text")
+    parser.add_argument("--output", help="write the report here instead of stdout")
+    args = parser.parse_args()
+
+    if args.dir:
+        dashboards = list(iter_dir_dashboards(Path(args.dir)))
+    elif args.pack:
+        dashboards = list(iter_pack_dashboards(Path(args.pack)))
+    elif args.offline:
+        raise SystemExit("--offline needs --dir or --pack")
+    else:
+        dashboards = fetch_live_dashboards()
+
+    types = {} if args.offline else fetch_datasource_types()
+    series = load_series_counts(dashboards, types, args.offline)
+    results = [lint_dashboard(d, series, types) for d in dashboards]
+
+    if args.max_score is not None:
+        for r in results:
+            if r["score"] > args.max_score:
+                r["flags"].append(f"score above {args.max_score:g}")
+
+    if args.sort == "title":
+        results.sort(key=lambda r: r["title"] or "")
+    else:
+        results.sort(key=lambda r: r[args.sort], reverse=True)
+
+    offenders = sum(1 for r in results if r["flags"])
+    if args.top:
+        results = results[:args.top]
+
+    output = format_report(results, args.format)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    else:
+        sys.stdout.write(output)
+
+    print(f"\n{len(dashboards)} dashboards, {offenders} flagged", file=sys.stderr)
+    sys.exit(1 if offenders else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import zlib
+import struct
+import hashlib
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+# Single-file, content-addressed dashboard backup.
+#
+# Layout:   MAGIC | object blobs ... | index | footer
+#
+# Every panel (including panels nested in collapsed rows), templating
+# variable and annotation is stored once as a zlib-compressed JSON blob
+# keyed by the sha256 of its canonical JSON, and replaced in its parent by
+# {"__pack_ref__": "<sha256>"}. The dehydrated export payload itself is
+# also a blob. The index maps uid -> root blob and blob -> (offset, length),
+# so a single dashboard can be read without scanning the file.
+
+MAGIC = b"GDPACK1\n"
+FOOTER = struct.Struct("<QQ8s")
+FOOTER_MAGIC = b"GDPACKI\n"
+REF_KEY = "__pack_ref__"
+CACHE_SIZE = 4096
+
+
+def canonical(obj) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class PackWriter:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.tmp = self.path.with_name(self.path.name + ".tmp")
+        self.f = self.tmp.open("wb")
+        self.f.write(MAGIC)
+        self.objects = {}
+        self.dashboards = {}
+        self.raw_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.f.close()
+            self.tmp.unlink(missing_ok=True)
+
+    def put(self, obj) -> str:
+        data = canonical(obj)
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in self.objects:
+            blob = zlib.compress(data, 6)
+            self.objects[digest] = (self.f.tell(), len(blob))
+            self.f.write(blob)
+        return digest
+
+    def ref(self, obj) -> dict:
+        return {REF_KEY: self.put(obj)}
+
+    def dehydrate_panels(self, panels: list) -> list:
+        out = []
+        for panel in panels:
+            if "panels" in panel:
+                panel = {**panel, "panels": self.dehydrate_panels(panel["panels"])}
+            out.append(self.ref(panel))
+        return out
+
+    def dehydrate(self, dashboard: dict) -> dict:
+        dashboard = dict(dashboard)
+        if "panels" in dashboard:
+            dashboard["panels"] = self.dehydrate_panels(dashboard["panels"])
+        for section in ("templating", "annotations"):
+            if isinstance(dashboard.get(section), dict) and "list" in dashboard[section]:
+                dashboard[section] = {
+                    **dashboard[section],
+                    "list": [self.ref(item) for item in dashboard[section]["list"]],
+                }
+        return dashboard
+
+    def add(self, uid: str, payload: dict):
+        # payload is an export payload ({"dashboard": ..., "meta": ...}) or a bare dashboard.
+        self.raw_bytes += len(json.dumps(payload, indent=2, ensure_ascii=False).encode("utf-8"))
+        if "dashboard" in payload:
+            root = {**payload, "dashboard": self.dehydrate(payload["dashboard"])}
+        else:
+            root = self.dehydrate(payload)
+        dashboard = payload.get("dashboard", payload)
+        self.dashboards[uid] = {"root": self.put(root), "title": dashboard.get("title")}
+
+    def close(self):
+        index = zlib.compress(canonical({"version": 1, "objects": self.objects, "dashboards": self.dashboards}))
+        offset = self.f.tell()
+        self.f.write(index)
+        self.f.write(FOOTER.pack(offset, len(index), FOOTER_MAGIC))
+        self.f.close()
+        os.replace(self.tmp, self.path)
+
+
+class PackReader:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.f = self.path.open("rb")
+        self.lock = threading.Lock()
+        # Decoded blobs are cached so shared panels are decompressed once.
+        self.load = lru_cache(maxsize=CACHE_SIZE)(self.load_blob)
+
+        if self.f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a dashboard pack: {self.path}")
+
+        self.f.seek(-FOOTER.size, os.SEEK_END)
+        offset, length, magic = FOOTER.unpack(self.f.read(FOOTER.size))
+        if magic != FOOTER_MAGIC:
+            raise ValueError(f"Truncated dashboard pack: {self.path}")
+
+        index = json.loads(zlib.decompress(self.read_at(offset, length)))
+        self.objects = index["objects"]
+        self.dashboards = index["dashboards"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read_at(self, offset: int, length: int) -> bytes:
+        with self.lock:
+            self.f.seek(offset)
+            return self.f.read(length)
+
+    def load_blob(self, digest: str):
+        return json.loads(zlib.decompress(self.read_at(*self.objects[digest])))
+
+    def hydrate(self, obj):
+        if isinstance(obj, dict):
+            if REF_KEY in obj and len(obj) == 1:
+                return self.hydrate(self.load(obj[REF_KEY]))
+            return {k: self.hydrate(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [self.hydrate(v) for v in obj]
+        return obj
+
+    def uids(self) -> list:
+        return list(self.dashboards)
+
+    def get(self, uid: str) -> dict:
+        return self.hydrate(self.load(self.dashboards[uid]["root"]))
+
+    def close(self):
+        self.f.close()
+
+
+def main():
+    # Inspect a pack: python dashboard_pack.py backup.gdpack [uid]
+    if len(sys.argv) < 2:
+        raise SystemExit("Usage: python dashboard_pack.py <pack> [uid]")
+
+    with PackReader(Path(sys.argv[1])) as pack:
+        if len(sys.argv) > 2:
+            print(json.dumps(pack.get(sys.argv[2]), indent=2, ensure_ascii=False))
+            return
+
+        for uid, entry in pack.dashboards.items():
+            print(f"{uid}\t{entry['title']}")
+        print(f"{len(pack.dashboards)} dashboards, {len(pack.objects)} unique objects, "
+              f"{pack.path.stat().st_size} bytes")
+
+
+if __name__ == "__main__":
+    main()
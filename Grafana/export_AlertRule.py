@@ -1,66 +1,141 @@
 import os
+import re
+import sys
+import gzip
 import json
-import requests
-import urllib3
+import codecs
+import filecmp
 from pathlib import Path
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from request.grafana_api_client import default_client
+from request.grafana_common import iter_json_object_arrays
+from export_dashboard import safe_filename
 
-GRAFANA_URL = os.getenv("GRAFANA_URL")
-GRAFANA_TOKEN = os.getenv("GRAFANA_TOKEN")
 OUTPUT_DIR = Path("grafana_alert_rules")
+STREAM = os.getenv("GRAFANA_RULES_STREAM", "").lower() in ("1", "true", "yes")
+PACKED = os.getenv("GRAFANA_RULES_PACKED", "").lower() in ("1", "true", "yes")
+CHUNK_SIZE = 1 << 20
 
-if not GRAFANA_URL or not GRAFANA_TOKEN:
-    raise SystemExit("GRAFANA_URL and GRAFANA_TOKEN must be set")
-
-HEADERS = {
-    "Authorization": f"Bearer {GRAFANA_TOKEN}",
-    "Content-Type": "application/json",
-}
-
-OUTPUT_DIR.mkdir(exist_ok=True)
+RULER_PATH = "/api/ruler/grafana/api/v1/rules"
 
 def fetch_alert_rule_groups():
-    url = f"{GRAFANA_URL.rstrip('/')}/api/ruler/grafana/api/v1/rules"
-    r = requests.get(url, headers=HEADERS, verify=False)
+    r = default_client().get(RULER_PATH)
 
     if r.status_code != 200:
         raise RuntimeError(f"Failed to fetch rules: {r.status_code} - {r.text}")
 
     return r.json()
 
-def save_rules(rule_groups: dict):
-    count = 0
+def stream_alert_rule_groups():
+    with default_client().get(RULER_PATH, stream=True) as r:
+        if r.status_code != 200:
+            raise RuntimeError(f"Failed to fetch rules: {r.status_code} - {r.text}")
 
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        chunks = (decoder.decode(chunk) for chunk in r.iter_content(chunk_size=CHUNK_SIZE))
+        # {"namespace": [group, ...], ...}, one group in memory at a time.
+        yield from iter_json_object_arrays(chunks)
+
+def iter_rule_groups(rule_groups: dict):
     for namespace, groups in rule_groups.items():
         for group in groups:
-            group_name = group.get("name", "group")
-            rules = group.get("rules", [])
+            yield namespace, group
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    if path.exists() and path.read_bytes() == data:
+        return False
 
-            for rule in rules:
-                uid = rule.get("uid", "no_uid")
-                title = rule.get("title", "unnamed").replace(" ", "_")
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return True
 
-                filename = f"{title}__{uid}.json"
-                path = OUTPUT_DIR / filename
+def save_rules(rule_groups: dict):
+    save_rule_stream(iter_rule_groups(rule_groups))
 
-                with path.open("w", encoding="utf-8") as f:
-                    json.dump(rule, f, indent=2)
+def save_rule_stream(groups):
+    count = written = 0
 
+    for namespace, group in groups:
+        for rule in group.get("rules", []):
+            # Ruler responses nest the Grafana fields under "grafana_alert".
+            alert = rule.get("grafana_alert", {})
+            uid = rule.get("uid") or alert.get("uid") or "no_uid"
+            title = safe_filename(rule.get("title") or alert.get("title"), default="unnamed")
+
+            filename = f"{title}__{uid}.json"
+            path = OUTPUT_DIR / filename
+
+            if write_if_changed(path, json.dumps(rule, indent=2).encode("utf-8")):
                 print(f"Saved: {filename}")
-                count += 1
+                written += 1
+            count += 1
+
+    print(f"Total rules exported: {count} ({written} changed)")
+
+def pack_path(namespace: str) -> Path:
+    return OUTPUT_DIR / (re.sub(r"[^\w\-.@() ]", "_", namespace) + ".ndjson.gz")
+
+def close_pack(path: Path, raw, pack) -> bool:
+    pack.close()
+    raw.close()
+    tmp = Path(raw.name)
 
-    print(f"Total rules exported: {count}")
+    if path.exists() and filecmp.cmp(tmp, path, shallow=False):
+        tmp.unlink()
+        return False
+
+    os.replace(tmp, path)
+    print(f"Saved: {path.name}")
+    return True
+
+def save_packed(groups):
+    # One gzip-compressed NDJSON file per namespace, one rule group per line,
+    # streamed to disk. Namespaces arrive contiguously in the response.
+    current = path = raw = pack = None
+    namespaces = rules = 0
+
+    for namespace, group in groups:
+        if namespace != current:
+            if pack is not None:
+                close_pack(path, raw, pack)
+            current, path = namespace, pack_path(namespace)
+            raw = path.with_name(path.name + ".tmp").open("wb")
+            # Empty filename and mtime=0 keep the bytes stable across runs.
+            pack = gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0)
+            namespaces += 1
+
+        pack.write((json.dumps(group, separators=(",", ":")) + "\n").encode("utf-8"))
+        rules += len(group.get("rules", []))
+
+    if pack is not None:
+        close_pack(path, raw, pack)
+
+    print(f"Total rules exported: {rules} in {namespaces} namespace pack(s)")
 
 def main():
+    default_client()
+    OUTPUT_DIR.mkdir(exist_ok=True)
+
     print("Fetching Grafana alert rule groups...")
-    rule_groups = fetch_alert_rule_groups()
 
-    if not rule_groups:
-        print("No alert rules found.")
-        return
+    if STREAM:
+        groups = stream_alert_rule_groups()
+    else:
+        rule_groups = fetch_alert_rule_groups()
+
+        if not rule_groups:
+            print("No alert rules found.")
+            return
+
+        groups = iter_rule_groups(rule_groups)
+
+    if PACKED:
+        save_packed(groups)
+    else:
+        save_rule_stream(groups)
 
-    save_rules(rule_groups)
     print("Done.")
 
 if __name__ == "__main__":
@@ -1,53 +1,76 @@
 import os
 import re
+import sys
 import json
+import hashlib
 import requests
-import urllib3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
  
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from request.grafana_api_client import default_client
+from dashboard_pack import PackWriter
  
-GRAFANA_URL = os.getenv("GRAFANA_URL")
-GRAFANA_TOKEN = os.getenv("GRAFANA_TOKEN")
 OUTPUT_DIR = Path(os.getenv("GRAFANA_DASH_OUT", "grafana_dashboards"))
+WORKERS = max(1, int(os.getenv("GRAFANA_EXPORT_WORKERS", "8")))
+# /api/search returns at most 5000 hits per page whatever limit is asked for.
+MAX_SEARCH_PAGE_SIZE = 5000
+SEARCH_PAGE_SIZE = min(MAX_SEARCH_PAGE_SIZE, int(os.getenv("GRAFANA_SEARCH_PAGE_SIZE", "1000")))
+INCREMENTAL = os.getenv("GRAFANA_EXPORT_INCREMENTAL", "").lower() in ("1", "true", "yes")
+MANIFEST_PATH = OUTPUT_DIR / ".export_manifest.json"
+PACK_PATH = os.getenv("GRAFANA_DASH_PACK")
  
-if not GRAFANA_URL or not GRAFANA_TOKEN:
-    raise SystemExit("GRAFANA_URL and GRAFANA_TOKEN environment variables are required")
+UNCHANGED = object()
  
-SESSION = requests.Session()
-SESSION.headers.update({
-    "Authorization": f"Bearer {GRAFANA_TOKEN}",
-    "Content-Type": "application/json",
-})
  
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
- 
- 
-def safe_filename(s: str, maxlen: int = 120) -> str:
+def safe_filename(s: str, maxlen: int = 120, default: str = "dashboard") -> str:
     s = (s or "").strip()
     s = re.sub(r"[\/\\:\*\?\"<>\|]", "_", s)
     s = re.sub(r"\s+", "_", s)
     s = re.sub(r"[^\w\-.@_() ]", "", s)
     if len(s) > maxlen:
         s = s[:maxlen].rstrip("_")
-    return s or "dashboard"
+    return s or default
+ 
+ 
+def iter_dashboards(page_size: int = SEARCH_PAGE_SIZE, client=None):
+    client = client or default_client()
+    # A short page ends the listing, so never ask for more than one can hold.
+    page_size = min(page_size, MAX_SEARCH_PAGE_SIZE)
+    page = 1
+    while True:
+        params = {"type": "dash-db", "limit": page_size, "page": page}
+        hits = client.get_json("/api/search", params=params)
+        yield from hits
+        if len(hits) < page_size:
+            return
+        page += 1
  
  
-def list_all_dashboards(limit: int = 5000):
-    url = f"{GRAFANA_URL.rstrip('/')}/api/search"
-    params = {"type": "dash-db", "limit": limit}
-    r = SESSION.get(url, params=params, verify=False, timeout=30)
+def list_all_dashboards(page_size: int = SEARCH_PAGE_SIZE):
+    return list(iter_dashboards(page_size))
+ 
+ 
+def fetch_dashboard_by_uid(uid: str, client=None):
+    r = (client or default_client()).get(f"/api/dashboards/uid/{uid}")
+    if r.status_code == 404:
+        return None
     r.raise_for_status()
     return r.json()
  
  
-def fetch_dashboard_by_uid(uid: str):
-    url = f"{GRAFANA_URL.rstrip('/')}/api/dashboards/uid/{uid}"
-    r = SESSION.get(url, verify=False, timeout=30)
+def fetch_dashboard_version(uid: str, client=None):
+    r = (client or default_client()).get(f"/api/dashboards/uid/{uid}/versions", params={"limit": 1})
     if r.status_code == 404:
         return None
     r.raise_for_status()
-    return r.json()
+    data = r.json()
+    # Grafana 11+ wraps the list: {"versions": [...], "continueToken": ...}
+    versions = data.get("versions", []) if isinstance(data, dict) else data
+    if not versions:
+        return None
+    return versions[0].get("version")
  
  
 def save_json(obj, path: Path):
@@ -55,25 +78,149 @@ def save_json(obj, path: Path):
         json.dump(obj, f, indent=2, ensure_ascii=False)
  
  
+def content_hash(obj) -> str:
+    raw = json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+ 
+ 
+def load_manifest() -> dict:
+    if not MANIFEST_PATH.exists():
+        return {}
+    with MANIFEST_PATH.open("r", encoding="utf-8") as f:
+        return json.load(f)
+ 
+ 
+def save_manifest(manifest: dict):
+    tmp = MANIFEST_PATH.with_suffix(".tmp")
+    save_json(manifest, tmp)
+    os.replace(tmp, MANIFEST_PATH)
+ 
+ 
+def fetch_entry(uid: str, known: dict | None = None):
+    try:
+        if known and (OUTPUT_DIR / known["file"]).exists():
+            if fetch_dashboard_version(uid) == known.get("version"):
+                return UNCHANGED, None
+        return fetch_dashboard_by_uid(uid), None
+    except requests.RequestException as e:
+        return None, e
+ 
+ 
+def fetch_in_order(entries, manifest: dict | None = None, workers: int = WORKERS):
+    # Fetches run concurrently, but results are yielded in listing order so
+    # filename assignment below stays deterministic. At most 2 * workers
+    # requests are queued at any time.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+ 
+        for entry in entries:
+            known = manifest.get(entry["uid"]) if manifest else None
+            pending.append((entry, pool.submit(fetch_entry, entry["uid"], known)))
+            if len(pending) >= workers * 2:
+                entry, future = pending.popleft()
+                yield (entry, *future.result())
+ 
+        while pending:
+            entry, future = pending.popleft()
+            yield (entry, *future.result())
+ 
+ 
+def save_incremental(manifest: dict, uid: str, payload: dict, filepath: Path):
+    # The filename embeds the uid, so in incremental mode it is owned by this
+    # dashboard and is overwritten in place instead of getting a suffix.
+    dashboard = payload.get("dashboard", {})
+    digest = content_hash(dashboard)
+    known = manifest.get(uid, {})
+ 
+    old_path = OUTPUT_DIR / known["file"] if known.get("file") else None
+    if old_path and old_path != filepath and old_path.exists():
+        old_path.unlink()
+ 
+    if known.get("sha256") != digest or not filepath.exists():
+        save_json(payload, filepath)
+        print(f"Saved: {filepath.name}")
+ 
+    manifest[uid] = {
+        "version": dashboard.get("version"),
+        "updated": payload.get("meta", {}).get("updated"),
+        "sha256": digest,
+        "file": filepath.name,
+    }
+ 
+ 
+def prune_deleted(manifest: dict, listed: set):
+    for uid in sorted(set(manifest) - listed):
+        path = OUTPUT_DIR / manifest.pop(uid)["file"]
+        if path.exists():
+            path.unlink()
+        print(f"Pruned (deleted in Grafana): {path.name}")
+ 
+ 
+def export_pack(path: Path):
+    print(f"Listing dashboards and packing into {path} ({WORKERS} workers)...")
+ 
+    entries = (entry for entry in iter_dashboards() if entry.get("uid"))
+    count = failed = 0
+ 
+    with PackWriter(path) as pack:
+        for entry, payload, error in fetch_in_order(entries):
+            if error is not None:
+                print(f"Failed: {entry['uid']} → {error}")
+                failed += 1
+                continue
+            if payload is None:
+                print(f"Not found (404): {entry['uid']}")
+                continue
+            pack.add(entry["uid"], payload)
+            count += 1
+ 
+    size = path.stat().st_size
+    print(f"Packed {count} dashboards, {len(pack.objects)} unique objects: "
+          f"{size} bytes (vs {pack.raw_bytes} as JSON files)")
+    if failed:
+        print(f"{failed} dashboard(s) failed to export.")
+    print("Done.")
+ 
+ 
 def main():
-    print("Listing dashboards...")
+    default_client()
  
-    results = list_all_dashboards()
-    if not results:
-        print("No dashboards found.")
+    if PACK_PATH:
+        if INCREMENTAL:
+            raise SystemExit("GRAFANA_DASH_PACK and GRAFANA_EXPORT_INCREMENTAL cannot be combined")
+        export_pack(Path(PACK_PATH))
         return
  
-    print(f"Found {len(results)} dashboards. Fetching and saving...")
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+ 
+    print(f"Listing dashboards and saving as they arrive ({WORKERS} workers)...")
  
-    for entry in results:
-        uid = entry.get("uid")
+    listed = set()
+ 
+    def entries():
+        for entry in iter_dashboards():
+            if not entry.get("uid"):
+                print(f"Skipping entry without uid: {entry}")
+                continue
+            listed.add(entry["uid"])
+            yield entry
+ 
+    manifest = load_manifest() if INCREMENTAL else None
+    failed = unchanged = 0
+ 
+    for entry, payload, error in fetch_in_order(entries(), manifest):
+        uid = entry["uid"]
         title = entry.get("title") or entry.get("dashboardTitle") or "dashboard"
  
-        if not uid:
-            print(f"Skipping entry without uid: {entry}")
+        if error is not None:
+            print(f"Failed: {uid} → {error}")
+            failed += 1
+            continue
+ 
+        if payload is UNCHANGED:
+            unchanged += 1
             continue
  
-        payload = fetch_dashboard_by_uid(uid)
         if payload is None:
             print(f"Not found (404): {uid}")
             continue
@@ -86,6 +233,10 @@ def main():
         filename = f"{base}__{uid}.json"
         filepath = OUTPUT_DIR / filename
  
+        if manifest is not None:
+            save_incremental(manifest, uid, payload, filepath)
+            continue
+ 
         i = 1
         while filepath.exists():
             filepath = OUTPUT_DIR / f"{base}__{uid}__{i}.json"
@@ -94,9 +245,25 @@ def main():
         save_json(payload, filepath)
         print(f"Saved: {filepath.name}")
  
+    # An empty listing still prunes: everything was deleted in Grafana.
+    if manifest is not None:
+        prune_deleted(manifest, listed)
+        save_manifest(manifest)
+ 
+    if not listed:
+        print("No dashboards found.")
+        return
+ 
+    if manifest is not None:
+        print(f"Unchanged: {unchanged}")
+ 
+    if failed:
+        print(f"{failed} dashboard(s) failed to export.")
+ 
     print("Done.")
  
  
 if __name__ == "__main__":
     main()
  
+ 
\ No newline at end of file
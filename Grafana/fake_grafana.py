@@ -0,0 +1,301 @@
+import re
+import sys
+import zlib
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import unquote
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from request.fake_server import FakeServer
+
+# In-process stand-in for the Grafana endpoints used by the scripts in this
+# directory. It generates synthetic dashboards, alert rules and Prometheus
+# metrics, and can inject latency and errors. Used by bench.py; can also be
+# started on its own:
+#
+#   python Grafana/fake_grafana.py --port 3000 --dashboards 2000 --latency-ms 20
+#   GRAFANA_URL=http://127.0.0.1:3000 GRAFANA_TOKEN=x python Grafana/export_dashboard.py
+
+PROM_DS_ID = 1
+PROM_DS_UID = "prometheus"
+
+
+def make_metrics(count: int) -> list:
+    return [f"app_metric_{i}_total" for i in range(count)]
+
+
+def make_dashboard(i: int, metrics: list, rng: random.Random) -> dict:
+    def panel(pid: int) -> dict:
+        metric = rng.choice(metrics)
+        return {
+            "id": pid,
+            "type": "timeseries",
+            "title": f"Panel {pid}",
+            "datasource": {"type": "prometheus", "uid": PROM_DS_UID},
+            "gridPos": {"h": 8, "w": 12, "x": 0, "y": pid * 8},
+            "targets": [{
+                "refId": "A",
+                "datasource": {"type": "prometheus", "uid": PROM_DS_UID},
+                "expr": f'sum by (job) (rate({metric}{{job="$job"}}[$__rate_interval]))',
+            }],
+        }
+
+    panels = [panel(pid) for pid in range(1, 7)]
+    # A collapsed row with nested panels, as Grafana stores them.
+    panels.append({"id": 100, "type": "row", "title": "Details", "collapsed": True,
+                   "panels": [panel(pid) for pid in range(101, 104)]})
+
+    return {
+        "uid": f"dash-{i:06d}",
+        "title": f"Service {i % 250} overview {i}",
+        "tags": ["synthetic"],
+        "version": 1,
+        "refresh": rng.choice(["", "30s", "1m", "5s"]),
+        "schemaVersion": 39,
+        "panels": panels,
+        "templating": {"list": [{
+            "name": "job",
+            "type": "query",
+            "datasource": {"type": "prometheus", "uid": PROM_DS_UID},
+            "query": "label_values(up, job)",
+        }]},
+    }
+
+
+def make_rule(n: int, folder_uid: str, group: str, metrics: list, rng: random.Random) -> dict:
+    return {
+        "uid": f"rule-{n:06d}",
+        "title": f"Synthetic alert {n}",
+        "condition": "B",
+        "folderUID": folder_uid,
+        "ruleGroup": group,
+        "for": "5m",
+        "noDataState": "NoData",
+        "execErrState": "Error",
+        "labels": {"severity": rng.choice(["warning", "critical"])},
+        "annotations": {"summary": f"Synthetic alert {n}"},
+        "data": [
+            {
+                "refId": "A",
+                "datasourceUid": PROM_DS_UID,
+                "relativeTimeRange": {"from": 600, "to": 0},
+                "model": {"refId": "A", "expr": f"rate({rng.choice(metrics)}[5m])"},
+            },
+            {
+                "refId": "B",
+                "datasourceUid": "__expr__",
+                "model": {"refId": "B", "type": "threshold", "expression": "A"},
+            },
+        ],
+    }
+
+
+class FakeGrafana(FakeServer):
+    def __init__(self, dashboards: int = 100, rules: int = 100, metrics: int = 1000,
+                 latency_ms: float = 0.0, error_rate: float = 0.0, seed: int = 1):
+        super().__init__()
+        rng = random.Random(seed)
+        self.latency = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self.rng = random.Random(seed + 1)
+        self.lock = threading.Lock()
+
+        self.metrics = make_metrics(metrics)
+        self.series = {m: rng.randint(1, 500) for m in self.metrics}
+        self.dashboards = {}
+        # uid -> folder uid ("" is the General folder)
+        self.dashboard_folders = {}
+        for i in range(dashboards):
+            d = make_dashboard(i, self.metrics, rng)
+            self.dashboards[d["uid"]] = d
+
+        self.folders = {f"Folder {i}": f"folder-{i}" for i in range(max(1, rules // 100))}
+        # (folder_uid, group) -> {"interval": seconds, "rules": [...]}
+        self.groups = {}
+        folder_uids = list(self.folders.values())
+        for n in range(rules):
+            folder_uid = folder_uids[n % len(folder_uids)]
+            group = f"group-{(n // len(folder_uids)) % 10}"
+            entry = self.groups.setdefault((folder_uid, group), {"interval": 60, "rules": []})
+            entry["rules"].append(make_rule(n, folder_uid, group, self.metrics, rng))
+
+
+    # --- endpoint handlers: return (status, body) ---------------------------
+
+    def search(self, query: dict):
+        limit = int(query.get("limit", ["1000"])[0])
+        page = int(query.get("page", ["1"])[0])
+        text = query.get("query", [""])[0].lower()
+        with self.lock:
+            hits = [
+                {"uid": d["uid"], "title": d["title"], "type": "dash-db", "tags": d.get("tags", []),
+                 **({"folderUid": f} if (f := self.dashboard_folders.get(d["uid"])) else {})}
+                for d in self.dashboards.values()
+                if text in d["title"].lower()
+            ]
+        return 200, hits[(page - 1) * limit:page * limit]
+
+    def get_dashboard(self, uid: str):
+        with self.lock:
+            d = self.dashboards.get(uid)
+            if d is None:
+                return 404, {"message": "Dashboard not found"}
+            return 200, {"dashboard": {**d, "id": zlib.crc32(uid.encode()) & 0xFFFF},
+                         "meta": {"updated": "2024-01-01T00:00:00Z",
+                                  "folderUid": self.dashboard_folders.get(uid, "")}}
+
+    def get_versions(self, uid: str):
+        with self.lock:
+            d = self.dashboards.get(uid)
+            if d is None:
+                return 404, {"message": "Dashboard not found"}
+            return 200, [{"version": d["version"], "created": "2024-01-01T00:00:00Z"}]
+
+    def save_dashboard(self, body: dict):
+        d = dict(body["dashboard"])
+        d.pop("id", None)
+        uid = d.setdefault("uid", f"dash-new-{len(self.dashboards)}")
+        with self.lock:
+            d["version"] = self.dashboards.get(uid, {}).get("version", 0) + 1
+            self.dashboards[uid] = d
+            self.dashboard_folders[uid] = body.get("folderUid") or ""
+        return 200, {"status": "success", "uid": uid, "version": d["version"]}
+
+    def create_folder(self, body: dict):
+        with self.lock:
+            if body["title"] in self.folders:
+                return 409, {"message": "a folder with the same name already exists"}
+            uid = body.get("uid") or f"folder-{len(self.folders)}"
+            self.folders[body["title"]] = uid
+        return 200, {"uid": uid, "title": body["title"]}
+
+    def get_folder(self, uid: str):
+        with self.lock:
+            title = next((t for t, u in self.folders.items() if u == uid), None)
+        if title is None:
+            return 404, {"message": "folder not found"}
+        return 200, {"uid": uid, "title": title}
+
+    def ruler(self):
+        titles = {uid: title for title, uid in self.folders.items()}
+        out = defaultdict(list)
+        with self.lock:
+            for (folder_uid, group), entry in self.groups.items():
+                out[titles.get(folder_uid, folder_uid)].append({
+                    "name": group,
+                    "interval": f"{entry['interval']}s",
+                    "rules": [
+                        {"for": r["for"], "labels": r["labels"], "annotations": r["annotations"],
+                         "grafana_alert": {**r, "rule_group": group, "namespace_uid": folder_uid,
+                                           "intervalSeconds": entry["interval"]}}
+                        for r in entry["rules"]
+                    ],
+                })
+        return 200, out
+
+    def create_rule(self, body: dict):
+        key = (body["folderUID"], body["ruleGroup"])
+        with self.lock:
+            entry = self.groups.setdefault(key, {"interval": 60, "rules": []})
+            rule = {**body, "uid": body.get("uid") or f"rule-new-{sum(len(g['rules']) for g in self.groups.values())}"}
+            entry["rules"].append(rule)
+        return 201, rule
+
+    def get_group(self, folder_uid: str, group: str):
+        with self.lock:
+            entry = self.groups.get((folder_uid, group))
+            if entry is None:
+                return 404, {"message": "rule group not found"}
+            return 200, {"title": group, "folderUid": folder_uid, **entry}
+
+    def put_group(self, folder_uid: str, group: str, body: dict):
+        with self.lock:
+            self.groups[(folder_uid, group)] = {"interval": body.get("interval", 60), "rules": body.get("rules", [])}
+        return 200, body
+
+    def datasources(self):
+        return 200, [{"id": PROM_DS_ID, "uid": PROM_DS_UID, "name": "Prometheus",
+                      "type": "prometheus", "isDefault": True}]
+
+    def label_values(self):
+        return 200, {"status": "success", "data": self.metrics}
+
+    def prom_query(self, query: str):
+        # Understands the batched count query issued by the scripts:
+        #   count by (__name__) ({__name__=~"a|b|c"})
+        result = []
+        m = re.search(r'__name__=~"([^"]*)"', query)
+        if m and "by (__name__)" in query:
+            result = [
+                {"metric": {"__name__": name}, "value": [time.time(), str(self.series[name])]}
+                for name in m.group(1).split("|") if name in self.series
+            ]
+        return 200, {"status": "success", "data": {"resultType": "vector", "result": result}}
+
+    def dispatch(self, method: str, path: str, query: dict, body):
+        if method == "GET" and path == "/api/search":
+            return "search", self.search(query)
+        if m := re.fullmatch(r"/api/dashboards/uid/([^/]+)/versions", path):
+            return "versions", self.get_versions(m.group(1))
+        if m := re.fullmatch(r"/api/dashboards/uid/([^/]+)", path):
+            return "dashboard", self.get_dashboard(m.group(1))
+        if method == "POST" and path == "/api/dashboards/db":
+            return "save_dashboard", self.save_dashboard(body)
+        if path == "/api/folders":
+            if method == "POST":
+                return "create_folder", self.create_folder(body)
+            return "folders", (200, [{"title": t, "uid": u} for t, u in self.folders.items()])
+        if m := re.fullmatch(r"/api/folders/([^/]+)", path):
+            return "folder", self.get_folder(m.group(1))
+        if path == "/api/ruler/grafana/api/v1/rules":
+            return "ruler", self.ruler()
+        if method == "POST" and path == "/api/v1/provisioning/alert-rules":
+            return "create_rule", self.create_rule(body)
+        if m := re.fullmatch(r"/api/v1/provisioning/folder/([^/]+)/rule-groups/([^/]+)", path):
+            folder_uid, group = m.group(1), unquote(m.group(2))
+            if method == "PUT":
+                return "put_group", self.put_group(folder_uid, group, body)
+            return "get_group", self.get_group(folder_uid, group)
+        if path == "/api/datasources":
+            return "datasources", self.datasources()
+        if re.fullmatch(r"/api/datasources/proxy/\d+/api/v1/label/__name__/values", path):
+            return "label_values", self.label_values()
+        if re.fullmatch(r"/api/datasources/proxy/\d+/api/v1/query", path):
+            return "prom_query", self.prom_query((body or {}).get("query") or query.get("query", [""])[0])
+        return "unknown", (404, {"message": "Not found"})
+
+    # --- server -------------------------------------------------------------
+
+    def respond(self, handler, method: str, path: str, query: dict, body):
+        if not handler.headers.get("Authorization", "").startswith("Bearer "):
+            return "unauthorized", 401, {"message": "Unauthorized"}
+        if self.error_rate and self.rng.random() < self.error_rate:
+            return "injected_error", 503, {"message": "injected"}
+        key, (status, payload) = self.dispatch(method, path, query, body)
+        return key, status, payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Grafana server for offline tests and benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--dashboards", type=int, default=100)
+    parser.add_argument("--rules", type=int, default=100)
+    parser.add_argument("--metrics", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean injected latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    fake = FakeGrafana(args.dashboards, args.rules, args.metrics, args.latency_ms, args.error_rate, args.seed)
+    print(f"Fake Grafana on http://{args.host}:{args.port} "
+          f"({args.dashboards} dashboards, {args.rules} rules, {args.metrics} metrics)")
+    fake.serve_forever(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,29 @@
 import os
+import sys
 import json
 import shutil
-import requests
-import urllib3
+import asyncio
+from collections import defaultdict
 from pathlib import Path
+from urllib.parse import quote
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from request.grafana_api_client import default_client
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-
-GRAFANA_URL = os.getenv("GRAFANA_URL")
-GRAFANA_TOKEN = os.getenv("GRAFANA_TOKEN")
-
-if not GRAFANA_URL or not GRAFANA_TOKEN:
-    raise SystemExit("GRAFANA_URL and GRAFANA_TOKEN must be set")
+BY_GROUP = os.getenv("GRAFANA_IMPORT_BY_GROUP", "").lower() in ("1", "true", "yes")
+CREATE_FOLDERS = os.getenv("GRAFANA_CREATE_FOLDERS", "").lower() in ("1", "true", "yes")
+WORKERS = max(1, int(os.getenv("GRAFANA_IMPORT_WORKERS", "4")))
+DEFAULT_GROUP_INTERVAL = int(os.getenv("GRAFANA_RULE_GROUP_INTERVAL", "60"))
 
 INPUT_DIR = Path("alert_rules_to_upload")
 ARCHIVE_DIR = Path("alert_rules_uploaded")
 
-INPUT_DIR.mkdir(exist_ok=True)
-ARCHIVE_DIR.mkdir(exist_ok=True)
-
-HEADERS = {
-    "Authorization": f"Bearer {GRAFANA_TOKEN}",
-    "Content-Type": "application/json",
-}
+REQUIRED_FIELDS = ("title", "ruleGroup", "folderName", "condition", "data")
 
 def get_folders():
    
-    url = f"{GRAFANA_URL.rstrip('/')}/api/folders"
-    r = requests.get(url, headers=HEADERS, verify=False)
+    r = default_client().get("/api/folders")
 
     if r.status_code != 200:
         raise RuntimeError(f"Failed to fetch folders: {r.text}")
@@ -43,20 +37,151 @@ def upload_alert_rule(rule: dict, folder_uid: str):
     payload.pop("folderName")
     payload["folderUID"] = folder_uid
 
-    url = f"{GRAFANA_URL.rstrip('/')}/api/v1/provisioning/alert-rules"
-
-    r = requests.post(
-        url,
-        headers=HEADERS,
-        json=payload,
-        verify=False
+    r = default_client().post(
+        "/api/v1/provisioning/alert-rules",
+        json=payload
     )
 
     if r.status_code not in (200, 201):
         raise RuntimeError(f"HTTP {r.status_code}: {r.text}")
 
 
+def create_folder(title: str) -> str:
+
+    r = default_client().post("/api/folders", json={"title": title})
+
+    if r.status_code not in (200, 201):
+        raise RuntimeError(f"Failed to create folder '{title}': {r.status_code} - {r.text}")
+
+    return r.json()["uid"]
+
+
+def load_rule(file: Path) -> dict:
+
+    with open(file) as f:
+        rule = json.load(f)
+
+    for key in REQUIRED_FIELDS:
+        if key not in rule:
+            raise ValueError(f"Missing required field: {key}")
+
+    return rule
+
+
+def rule_group_path(folder_uid: str, group: str) -> str:
+    return f"/api/v1/provisioning/folder/{folder_uid}/rule-groups/{quote(group, safe='')}"
+
+
+def get_rule_group(folder_uid: str, group: str):
+
+    r = default_client().get(rule_group_path(folder_uid, group))
+
+    if r.status_code == 404:
+        return None
+
+    if r.status_code != 200:
+        raise RuntimeError(f"Failed to fetch rule group: {r.status_code} - {r.text}")
+
+    return r.json()
+
+
+def is_same_rule(rule: dict, current: dict) -> bool:
+    if rule.get("uid"):
+        return rule["uid"] == current.get("uid")
+    return rule["title"] == current.get("title")
+
+
+def upload_rule_group(folder_uid: str, group: str, rules: list):
+
+    # PUT replaces the whole group, so merge with what is already on the
+    # server; rules are matched by uid, falling back to title.
+    existing = get_rule_group(folder_uid, group) or {}
+    merged = list(existing.get("rules", []))
+
+    for rule in rules:
+        payload = {k: v for k, v in rule.items() if k != "folderName"}
+        payload["folderUID"] = folder_uid
+        payload["ruleGroup"] = group
+
+        for i, current in enumerate(merged):
+            if is_same_rule(payload, current):
+                payload.setdefault("uid", current.get("uid"))
+                merged[i] = payload
+                break
+        else:
+            merged.append(payload)
+
+    body = {
+        "title": group,
+        "folderUid": folder_uid,
+        "interval": existing.get("interval", DEFAULT_GROUP_INTERVAL),
+        "rules": merged,
+    }
+
+    r = default_client().put(rule_group_path(folder_uid, group), json=body)
+
+    if r.status_code not in (200, 201, 202):
+        raise RuntimeError(f"HTTP {r.status_code}: {r.text}")
+
+
+def import_groups(files: list, folders: dict):
+
+    groups = defaultdict(list)
+
+    for file in files:
+        try:
+            rule = load_rule(file)
+            groups[(rule["folderName"], rule["ruleGroup"])].append((file, rule))
+        except Exception as e:
+            print(f"FAILED → {file.name}")
+            print(f"REASON → {e}\n")
+
+    # Folders are resolved up front on the main thread so concurrent groups
+    # never race to create the same folder. A folder that cannot be created
+    # fails only its own groups.
+    folder_errors = {}
+    for folder_name in sorted({folder for folder, _ in groups}):
+        if folder_name in folders or not CREATE_FOLDERS:
+            continue
+        try:
+            folders[folder_name] = create_folder(folder_name)
+            print(f"Created folder '{folder_name}'")
+        except Exception as e:
+            folder_errors[folder_name] = e
+            print(f"FAILED → folder '{folder_name}'")
+            print(f"REASON → {e}\n")
+
+    print(f"Uploading {len(groups)} rule group(s) with {WORKERS} workers\n")
+
+    def process(key):
+        folder_name, group = key
+        entries = groups[key]
+        if folder_name in folder_errors:
+            raise folder_errors[folder_name]
+        if folder_name not in folders:
+            raise ValueError(f"Folder '{folder_name}' does not exist in Grafana")
+        upload_rule_group(folders[folder_name], group, [rule for _, rule in entries])
+        for file, _ in entries:
+            shutil.move(file, ARCHIVE_DIR / file.name)
+
+    async def run():
+        async for (folder_name, group), _, error in default_client().fan_out(process, list(groups), WORKERS):
+            count = len(groups[(folder_name, group)])
+            if error is None:
+                print(f"SUCCESS → {folder_name}/{group}: archived {count} file(s)\n")
+            else:
+                print(f"FAILED → {folder_name}/{group} ({count} file(s))")
+                print(f"REASON → {error}\n")
+
+    asyncio.run(run())
+
+
 def main():
+    default_client()
+
+    INPUT_DIR.mkdir(exist_ok=True)
+    ARCHIVE_DIR.mkdir(exist_ok=True)
+
     files = list(INPUT_DIR.glob("*.json"))
 
     if not files:
@@ -67,19 +192,32 @@ def main():
 
     print(f"Found {len(files)} alert rule file(s)\n")
 
+    if BY_GROUP:
+        import_groups(files, folders)
+        print("Upload completed")
+        return
+
+    # A folder that could not be created is not retried for every file in it.
+    folder_errors = {}
+
     for file in files:
         try:
             print(f"Processing {file.name}")
 
-            with open(file) as f:
-                rule = json.load(f)
-              
-            for key in ("title", "ruleGroup", "folderName", "condition", "data"):
-                if key not in rule:
-                    raise ValueError(f"Missing required field: {key}")
+            rule = load_rule(file)
 
             folder_name = rule["folderName"]
 
+            if folder_name in folder_errors:
+                raise folder_errors[folder_name]
+
+            if folder_name not in folders and CREATE_FOLDERS:
+                try:
+                    folders[folder_name] = create_folder(folder_name)
+                except Exception as e:
+                    folder_errors[folder_name] = e
+                    raise
+
             if folder_name not in folders:
                 raise ValueError(f"Folder '{folder_name}' does not exist in Grafana")
 
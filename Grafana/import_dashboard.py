@@ -1,22 +1,23 @@
 import os
+import sys
 import json
-import requests
-import urllib3
+import asyncio
+import hashlib
 from pathlib import Path
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from request.grafana_api_client import default_client
+from dashboard_pack import PackReader
 
-GRAFANA_URL = os.getenv("GRAFANA_URL")
-GRAFANA_TOKEN = os.getenv("GRAFANA_TOKEN")
 DASHBOARD_DIR = Path(os.getenv("GRAFANA_DASH_DIR", "grafana_dashboards"))
+WORKERS = max(1, int(os.getenv("GRAFANA_IMPORT_WORKERS", "8")))
+PACK_PATH = os.getenv("GRAFANA_DASH_PACK")
+# Comma-separated uids to restore from a pack; empty restores everything.
+IMPORT_UIDS = [u for u in os.getenv("GRAFANA_IMPORT_UIDS", "").split(",") if u]
+FORCE = os.getenv("GRAFANA_IMPORT_FORCE", "").lower() in ("1", "true", "yes")
 
-if not GRAFANA_URL or not GRAFANA_TOKEN:
-    raise SystemExit("GRAFANA_URL and GRAFANA_TOKEN must be set")
-
-HEADERS = {
-    "Authorization": f"Bearer {GRAFANA_TOKEN}",
-    "Content-Type": "application/json"
-}
+# Fields Grafana assigns on save; they differ between copies of the same content.
+VOLATILE_KEYS = ("id", "version", "iteration")
 
 def load_dashboard_json(path: Path) -> dict:
     with path.open("r", encoding="utf-8") as f:
@@ -27,44 +28,104 @@ def load_dashboard_json(path: Path) -> dict:
 
     return data  # dashboard-only JSON
 
-def upload_dashboard(dashboard: dict, overwrite: bool = True):
+def dashboard_hash(dashboard: dict) -> str:
+    normalized = {k: v for k, v in dashboard.items() if k not in VOLATILE_KEYS}
+    raw = json.dumps(normalized, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def fetch_server_dashboard(uid: str, client=None):
+    r = (client or default_client()).get(f"/api/dashboards/uid/{uid}")
+
+    if r.status_code == 404:
+        return None
+
+    r.raise_for_status()
+    return r.json().get("dashboard")
+
+def is_unchanged(dashboard: dict) -> bool:
+    uid = dashboard.get("uid")
+    if not uid:
+        return False
+
+    current = fetch_server_dashboard(uid)
+    return current is not None and dashboard_hash(current) == dashboard_hash(dashboard)
+
+def upload_dashboard(dashboard: dict, overwrite: bool = True, client=None, folder_uid: str = None):
     payload = {
         "dashboard": dashboard,
         "overwrite": overwrite
     }
+    # "" is the General folder; None leaves the folder choice to Grafana.
+    if folder_uid is not None:
+        payload["folderUid"] = folder_uid
 
     payload["dashboard"].pop("id", None)
 
-    url = f"{GRAFANA_URL.rstrip('/')}/api/dashboards/db"
-    r = requests.post(url, headers=HEADERS, json=payload, verify=False)
+    # Saving with overwrite=True is safe to repeat, so let the client retry 5xx.
+    r = (client or default_client()).post("/api/dashboards/db", json=payload, idempotent=overwrite)
 
     if r.status_code not in (200, 201):
         raise RuntimeError(f"Upload failed: {r.status_code} - {r.text}")
 
     return r.json()
 
+def import_file(file: Path) -> str:
+    return import_model(load_dashboard_json(file))
+
+def import_model(dashboard: dict) -> str:
+    title = dashboard.get("title", "UNKNOWN")
+    uid = dashboard.get("uid", "NO_UID")
+
+    if not FORCE and is_unchanged(dashboard):
+        return f"Unchanged: {title} (uid={uid})"
+
+    upload_dashboard(dashboard)
+    return f"Imported: {title} (uid={uid})"
+
+async def import_all(items: list, import_item, label):
+    async for item, message, error in default_client().fan_out(import_item, items, WORKERS):
+        if error is not None:
+            print(f"Failed: {label(item)} → {error}")
+        else:
+            print(message)
+
+def import_pack(path: Path):
+    with PackReader(path) as pack:
+        uids = IMPORT_UIDS or pack.uids()
+        missing = [uid for uid in uids if uid not in pack.dashboards]
+        for uid in missing:
+            print(f"Not in pack: {uid}")
+        uids = [uid for uid in uids if uid in pack.dashboards]
+
+        print(f"Restoring {len(uids)} of {len(pack.dashboards)} dashboards from {path.name} with {WORKERS} workers...")
+
+        def import_uid(uid: str) -> str:
+            payload = pack.get(uid)
+            return import_model(payload.get("dashboard", payload))
+
+        asyncio.run(import_all(uids, import_uid, lambda uid: uid))
+
+    print("Done.")
+
 def main():
+    default_client()
+
+    if PACK_PATH:
+        import_pack(Path(PACK_PATH))
+        return
+
     if not DASHBOARD_DIR.exists():
         raise SystemExit(f"Directory not found: {DASHBOARD_DIR}")
 
-    files = list(DASHBOARD_DIR.glob("*.json"))
+    # Skip dotfiles such as the export manifest written by export_dashboard.py.
+    files = [f for f in DASHBOARD_DIR.glob("*.json") if not f.name.startswith(".")]
     if not files:
         print("No dashboard JSON files found.")
         return
 
-    print(f"Found {len(files)} dashboards. Uploading...")
-
-    for file in files:
-        try:
-            dashboard = load_dashboard_json(file)
-            title = dashboard.get("title", "UNKNOWN")
-            uid = dashboard.get("uid", "NO_UID")
-
-            result = upload_dashboard(dashboard)
-            print(f"Imported: {title} (uid={uid})")
+    print(f"Found {len(files)} dashboards. Uploading with {WORKERS} workers...")
 
-        except Exception as e:
-            print(f"Failed: {file.name} → {e}")
+    asyncio.run(import_all(files, import_file, lambda file: file.name))
 
     print("Done.")
 
@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import sqlite3
+from pathlib import Path
+
+INDEX_PATH = Path(os.getenv("GRAFANA_METRIC_INDEX", "metric_usage.db"))
+
+# Bump when the table layout or the extraction logic changes; older
+# indexes are then rebuilt from scratch on the next scan.
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dashboards (
+    uid TEXT PRIMARY KEY,
+    title TEXT,
+    version INTEGER
+);
+CREATE TABLE IF NOT EXISTS usages (
+    metric TEXT NOT NULL,
+    dashboard_uid TEXT NOT NULL REFERENCES dashboards(uid) ON DELETE CASCADE,
+    panel_id INTEGER,
+    panel_title TEXT,
+    expr TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS usages_metric ON usages(metric);
+CREATE INDEX IF NOT EXISTS usages_dashboard ON usages(dashboard_uid);
+"""
+
+
+class MetricIndex:
+    def __init__(self, path: Path = INDEX_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.conn.executescript("DROP TABLE IF EXISTS usages; DROP TABLE IF EXISTS dashboards;")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        self.conn.executescript(SCHEMA)
+
+    def versions(self) -> dict:
+        return dict(self.conn.execute("SELECT uid, version FROM dashboards"))
+
+    def replace_dashboard(self, uid: str, title: str, version, usages):
+        with self.conn:
+            self.conn.execute("DELETE FROM dashboards WHERE uid = ?", (uid,))
+            self.conn.execute(
+                "INSERT INTO dashboards (uid, title, version) VALUES (?, ?, ?)",
+                (uid, title, version),
+            )
+            self.conn.executemany(
+                "INSERT INTO usages (metric, dashboard_uid, panel_id, panel_title, expr) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((metric, uid, panel_id, panel_title, expr) for metric, panel_id, panel_title, expr in usages),
+            )
+
+    def remove_dashboards(self, uids):
+        with self.conn:
+            self.conn.executemany("DELETE FROM dashboards WHERE uid = ?", ((uid,) for uid in uids))
+
+    def used_metrics(self) -> set[str]:
+        return {row[0] for row in self.conn.execute("SELECT DISTINCT metric FROM usages")}
+
+    def who_uses(self, metric: str) -> list[dict]:
+        rows = self.conn.execute(
+            "SELECT d.uid, d.title, u.panel_id, u.panel_title, u.expr "
+            "FROM usages u JOIN dashboards d ON d.uid = u.dashboard_uid "
+            "WHERE u.metric = ? ORDER BY d.title, u.panel_id",
+            (metric,),
+        )
+        keys = ("dashboard_uid", "dashboard_title", "panel_id", "panel_title", "expr")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    if not INDEX_PATH.exists():
+        raise SystemExit(f"Index not found: {INDEX_PATH} (run unused_metrics.py first)")
+
+    index = MetricIndex()
+
+    if len(sys.argv) < 2:
+        dashboards = index.conn.execute("SELECT COUNT(*) FROM dashboards").fetchone()[0]
+        print(f"dashboards: {dashboards}")
+        print(f"used_metrics: {len(index.used_metrics())}")
+        print("Usage: python metric_index.py <metric> [<metric> ...]")
+        index.close()
+        return
+
+    result = {metric: index.who_uses(metric) for metric in sys.argv[1:]}
+    print(json.dumps(result, indent=2))
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from request.grafana_api_client import GrafanaClient
+from export_dashboard import iter_dashboards, fetch_dashboard_by_uid, fetch_dashboard_version, content_hash
+from import_dashboard import upload_dashboard, VOLATILE_KEYS
+
+# Mirrors dashboards from one Grafana to one or more others, transferring
+# only dashboards whose hash tree differs:
+#
+#   DEV_GRAFANA_URL=... DEV_GRAFANA_TOKEN=... PROD_GRAFANA_URL=... PROD_GRAFANA_TOKEN=...
+#   python Grafana/sync_dashboards.py --source DEV_GRAFANA --target PROD_GRAFANA [--dry-run]
+#
+# <PREFIX>_CA_CERT and <PREFIX>_INSECURE=1 set TLS verification per instance.
+#
+# Each dashboard gets a tree of leaf hashes (one per panel, including panels
+# inside collapsed rows, plus templating, annotations and the remaining
+# settings, which include the folder) and a root hash over the leaves. Trees
+# are cached per instance with the dashboard version and folder in
+# STATE_FILE, so a dashboard is only downloaded again when one of them moved.
+# Dashboards keep their folder on the targets; missing folders are created
+# there with the source's uid and title.
+
+STATE_FILE = Path(os.getenv("GRAFANA_SYNC_STATE", ".grafana_sync_state.json"))
+WORKERS = max(1, int(os.getenv("GRAFANA_SYNC_WORKERS", "8")))
+
+
+def panel_leaves(panels: list, leaves: dict, prefix: str = "panel"):
+    for i, panel in enumerate(panels):
+        key = f"{prefix}:{panel.get('id', f'#{i}')}"
+        leaves[key] = content_hash({k: v for k, v in panel.items() if k != "panels"})
+        panel_leaves(panel.get("panels", []), leaves, key)
+
+
+def hash_tree(dashboard: dict, folder_uid: str = "") -> dict:
+    leaves = {}
+    panel_leaves(dashboard.get("panels", []), leaves)
+    leaves["templating"] = content_hash(dashboard.get("templating"))
+    leaves["annotations"] = content_hash(dashboard.get("annotations"))
+    leaves["settings"] = content_hash({
+        "folderUid": folder_uid,
+        "dashboard": {
+            k: v for k, v in dashboard.items()
+            if k not in VOLATILE_KEYS and k not in ("panels", "templating", "annotations")
+        },
+    })
+    return {"root": content_hash(sorted(leaves.items())), "leaves": leaves}
+
+
+def diff_leaves(source: dict, target: dict) -> dict:
+    return {
+        "added": sorted(set(source) - set(target)),
+        "removed": sorted(set(target) - set(source)),
+        "changed": sorted(k for k in set(source) & set(target) if source[k] != target[k]),
+    }
+
+
+class Instance:
+    def __init__(self, prefix: str, state: dict):
+        self.client = GrafanaClient.from_env(prefix=prefix, max_concurrency=WORKERS)
+        self.name = prefix
+        self.cache = state.setdefault(self.client.base_url, {})
+        self.trees = {}
+        self.titles = {}
+        self.folders = {}
+        self.payloads = {}
+        self.known_folders = set()
+
+    def refresh_one(self, uid: str):
+        cached = self.cache.get(uid)
+        if (
+            cached
+            and cached.get("folder") == self.folders[uid]
+            and fetch_dashboard_version(uid, self.client) == cached["version"]
+        ):
+            return cached
+
+        payload = fetch_dashboard_by_uid(uid, self.client)
+        if payload is None:
+            return None
+
+        self.payloads[uid] = payload
+        dashboard = payload["dashboard"]
+        folder = payload.get("meta", {}).get("folderUid") or ""
+        self.folders[uid] = folder
+        return {"version": dashboard.get("version"), "folder": folder, "tree": hash_tree(dashboard, folder)}
+
+    def refresh(self):
+        hits = [h for h in iter_dashboards(client=self.client) if h.get("uid")]
+        self.titles = {h["uid"]: h.get("title") for h in hits}
+        self.folders = {h["uid"]: h.get("folderUid") or "" for h in hits}
+
+        async def run():
+            async for uid, entry, error in self.client.fan_out(self.refresh_one, list(self.titles), WORKERS):
+                if error is not None:
+                    print(f"[{self.name}] Failed: {uid} → {error}")
+                elif entry is not None:
+                    self.cache[uid] = entry
+                    self.trees[uid] = entry["tree"]
+
+        asyncio.run(run())
+
+        for uid in set(self.cache) - set(self.titles):
+            del self.cache[uid]
+
+    def instance_root(self) -> str:
+        return content_hash(sorted((uid, tree["root"]) for uid, tree in self.trees.items()))
+
+    def dashboard(self, uid: str) -> dict:
+        payload = self.payloads.get(uid) or fetch_dashboard_by_uid(uid, self.client)
+        return payload["dashboard"]
+
+    def ensure_folder(self, uid: str, source: "Instance"):
+        # Creates the source's folder (and its parents) here under the same uid.
+        if not uid or uid in self.known_folders:
+            return
+        r = self.client.get(f"/api/folders/{uid}")
+        if r.status_code == 404:
+            folder = source.client.get_json(f"/api/folders/{uid}")
+            body = {"uid": uid, "title": folder["title"]}
+            if folder.get("parentUid"):
+                self.ensure_folder(folder["parentUid"], source)
+                body["parentUid"] = folder["parentUid"]
+            r = self.client.post("/api/folders", json=body)
+            if r.status_code < 300:
+                print(f"[{self.name}] Created folder {folder['title']!r} ({uid})")
+        if r.status_code >= 300:
+            raise RuntimeError(f"Folder {uid}: {r.status_code} - {r.text}")
+        self.known_folders.add(uid)
+
+
+def sync_target(source: Instance, target: Instance, dry_run: bool) -> dict:
+    report = {"created": [], "updated": [], "failed": [], "in_sync": 0}
+
+    if source.instance_root() == target.instance_root():
+        report["in_sync"] = len(source.trees)
+        return report
+
+    for uid, tree in sorted(source.trees.items()):
+        current = target.trees.get(uid)
+        if current and current["root"] == tree["root"]:
+            report["in_sync"] += 1
+            continue
+
+        item = {"uid": uid, "title": source.titles.get(uid)}
+        if current:
+            item["drift"] = diff_leaves(tree["leaves"], current["leaves"])
+
+        if not dry_run:
+            folder = source.folders[uid]
+            try:
+                target.ensure_folder(folder, source)
+                result = upload_dashboard(dict(source.dashboard(uid)), client=target.client, folder_uid=folder)
+            except Exception as e:
+                report["failed"].append({**item, "error": str(e)})
+                continue
+            target.cache[uid] = {"version": result.get("version"), "folder": folder, "tree": tree}
+            target.trees[uid] = tree
+
+        report["updated" if current else "created"].append(item)
+
+    return report
+
+
+def load_state() -> dict:
+    if not STATE_FILE.exists():
+        return {}
+    with STATE_FILE.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state: dict):
+    tmp = STATE_FILE.with_name(STATE_FILE.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, STATE_FILE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync dashboards between Grafana instances by hash tree")
+    parser.add_argument("--source", required=True, help="env prefix of the source, e.g. DEV_GRAFANA")
+    parser.add_argument("--target", action="append", required=True, help="env prefix of a target (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="report drift without uploading")
+    parser.add_argument("--report", help="write the JSON drift report to this file")
+    args = parser.parse_args()
+
+    state = load_state()
+    instances = [Instance(prefix, state) for prefix in [args.source, *args.target]]
+
+    for instance in instances:
+        print(f"Hashing {instance.name} ({instance.client.base_url})...")
+        instance.refresh()
+        print(f"  {len(instance.trees)} dashboards, {len(instance.payloads)} downloaded")
+
+    source, targets = instances[0], instances[1:]
+    report = {}
+
+    for target in targets:
+        result = sync_target(source, target, args.dry_run)
+        report[target.name] = result
+        verb = "would transfer" if args.dry_run else "transferred"
+        print(f"{source.name} → {target.name}: {verb} {len(result['created'])} new, "
+              f"{len(result['updated'])} changed; {result['in_sync']} in sync; {len(result['failed'])} failed")
+        for item in result["updated"]:
+            drift = item["drift"]
+            print(f"  ~ {item['title']} ({item['uid']}): "
+                  f"{len(drift['changed'])} changed, {len(drift['added'])} added, {len(drift['removed'])} removed")
+
+    save_state(state)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    for instance in instances:
+        requests_made = sum(s["count"] for s in instance.client.latency_stats().values())
+        print(f"{instance.name}: {requests_made} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,206 @@
 import os
 import re
+import sys
 import json
-import requests
-import urllib3
+import asyncio
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+from metric_index import MetricIndex
+from export_dashboard import iter_dashboards, fetch_dashboard_by_uid, fetch_dashboard_version
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from request.grafana_api_client import default_client
+from request.grafana_common import parse_duration
 
-GRAFANA_URL = os.getenv("GRAFANA_URL")
-GRAFANA_TOKEN = os.getenv("GRAFANA_TOKEN")
+SERIES_BATCH_SIZE = int(os.getenv("SERIES_BATCH_SIZE", "200"))
+SERIES_WORKERS = max(1, int(os.getenv("SERIES_WORKERS", "8")))
+# Rough Prometheus cost of one active series (head memory + index + chunks).
+BYTES_PER_SERIES = int(os.getenv("PROM_BYTES_PER_SERIES", "4096"))
+# Used to turn range windows into samples read per series.
+SCRAPE_INTERVAL = float(os.getenv("PROM_SCRAPE_INTERVAL", "15"))
 
-if not GRAFANA_URL or not GRAFANA_TOKEN:
-    raise SystemExit("GRAFANA_URL and GRAFANA_TOKEN must be set")
+# Share of a metric's series each label matcher is assumed to keep. Catch-all
+# regexes keep everything.
+MATCHER_SELECTIVITY = {"=": 0.25, "=~": 0.5, "!=": 0.9, "!~": 0.9}
+MATCH_ALL = {".*", ".+"}
 
-HEADERS = {
-    "Authorization": f"Bearer {GRAFANA_TOKEN}",
-    "Content-Type": "application/json",
+# A ":" right after a duration is a subquery step separator, not the start of
+# a recording rule name such as ":job:cpu:rate5m".
+TOKEN_REGEX = re.compile(r"""
+    (?P<ws>\s+|\#[^\n]*)
+  | (?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|`[^`]*`)
+  | (?P<var>\$\{[^}]*\}|\$\w+|\[\[[^\]]*\]\])
+  | (?P<duration>(?:\d+(?:ms|[smhdwy]))+)
+  | (?P<number>0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<ident>[a-zA-Z_][a-zA-Z0-9_:]*|(?<!\w):[a-zA-Z_:][a-zA-Z0-9_:]*)
+  | (?P<punct>[{}()\[\],])
+  | (?P<op>=~|!~|!=|==|<=|>=|[-+*/%^=<>@:])
+  | (?P<other>.)
+""", re.VERBOSE)
+
+# Identifiers that are never metric names. Function names are recognised by
+# the "(" that follows them, so they do not need to be listed here.
+PROMQL_KEYWORDS = {
+    "sum", "avg", "min", "max", "count", "stddev", "stdvar", "topk",
+    "bottomk", "quantile", "count_values", "group", "limitk",
+    "limit_ratio", "and", "or", "unless", "atan2", "by", "without",
+    "on", "ignoring", "group_left", "group_right", "bool", "offset",
+    "start", "end", "inf", "nan",
 }
 
-SESSION = requests.Session()
-SESSION.headers.update(HEADERS)
-SESSION.verify = False  # Windows fix
+# Keywords followed by a parenthesised list of label names.
+LABEL_LIST_KEYWORDS = {"by", "without", "on", "ignoring", "group_left", "group_right"}
 
-METRIC_REGEX = re.compile(r"[a-zA-Z_:][a-zA-Z0-9_:]*")
+Selector = namedtuple("Selector", ["metric", "matchers", "range_seconds"])
 
-PROMQL_KEYWORDS = {
-    "sum", "avg", "min", "max", "count", "rate", "irate",
-    "increase", "histogram_quantile", "by", "without",
-    "on", "ignoring", "group_left", "group_right",
-    "bool", "offset"
-}
+def tokenize_promql(expr: str) -> list[tuple[str, str]]:
+    tokens = []
+    for m in TOKEN_REGEX.finditer(expr):
+        kind = m.lastgroup
+        if kind != "ws":
+            tokens.append((kind, m.group()))
+    return tokens
+
+def _skip_group(tokens, i: int, close: str) -> int:
+    # tokens[i] is the opening bracket; returns the index after its partner.
+    depth = 0
+    while i < len(tokens):
+        value = tokens[i][1]
+        if value in "({[":
+            depth += 1
+        elif value in ")}]":
+            depth -= 1
+            if depth == 0 and value == close:
+                return i + 1
+        i += 1
+    return i
+
+def _parse_matchers(tokens, i: int):
+    # tokens[i] is "{"; returns (matchers, index after "}").
+    matchers = []
+    i += 1
+    while i < len(tokens) and tokens[i][1] != "}":
+        if (
+            i + 2 < len(tokens)
+            and tokens[i][0] == "ident"
+            and tokens[i + 1][1] in ("=", "!=", "=~", "!~")
+            and tokens[i + 2][0] in ("string", "var")
+        ):
+            value = tokens[i + 2][1]
+            if tokens[i + 2][0] == "string":
+                value = value[1:-1]
+            matchers.append((tokens[i][1], tokens[i + 1][1], value))
+            i += 3
+        else:
+            i += 1
+    return tuple(matchers), i + 1
+
+def _parse_range(tokens, i: int):
+    # tokens[i] is "["; returns (seconds or None, index after "]").
+    end = _skip_group(tokens, i, "]")
+    inner = tokens[i + 1:end - 1]
+    if inner and inner[0][0] == "duration" and all(":" not in t[1] for t in inner):
+        return parse_duration(inner[0][1]), end
+    return None, end
+
+@lru_cache(maxsize=None)
+def _parse_normalized(expr: str) -> tuple:
+    tokens = tokenize_promql(expr)
+    selectors = []
+    i = 0
+
+    while i < len(tokens):
+        kind, value = tokens[i]
+        nxt = tokens[i + 1][1] if i + 1 < len(tokens) else None
+
+        if kind == "ident" and value.lower() in PROMQL_KEYWORDS:
+            if value.lower() in LABEL_LIST_KEYWORDS and nxt == "(":
+                i = _skip_group(tokens, i + 1, ")")
+            else:
+                i += 1
+            continue
+
+        if kind == "ident" and nxt == "(":
+            i += 1  # function call
+            continue
+
+        if value == "[":
+            # Range or subquery of a parenthesised expression, e.g. (...)[30m:1m].
+            i = _skip_group(tokens, i, "]")
+            continue
+
+        if kind == "ident" or value == "{":
+            metric = value if kind == "ident" else None
+            i = i + 1 if kind == "ident" else i
+            matchers = ()
+            if i < len(tokens) and tokens[i][1] == "{":
+                matchers, i = _parse_matchers(tokens, i)
+            if metric is None:
+                metric = next((v for label, op, v in matchers if label == "__name__" and op == "="), None)
+            range_seconds = None
+            if i < len(tokens) and tokens[i][1] == "[":
+                range_seconds, i = _parse_range(tokens, i)
+            selectors.append(Selector(metric, matchers, range_seconds))
+            continue
+
+        i += 1
+
+    return tuple(selectors)
+
+def normalize_expr(expr: str) -> str:
+    return " ".join(expr.split())
+
+def parse_selectors(expr: str) -> tuple:
+    return _parse_normalized(normalize_expr(expr))
 
 def extract_metrics(expr: str) -> set[str]:
-    tokens = METRIC_REGEX.findall(expr)
-    return {t for t in tokens if t not in PROMQL_KEYWORDS}
+    return {s.metric for s in parse_selectors(expr) if s.metric}
+
+def matcher_selectivity(matchers) -> float:
+    fraction = 1.0
+    for label, op, value in matchers:
+        if label == "__name__" or (op == "=~" and value in MATCH_ALL):
+            continue
+        fraction *= MATCHER_SELECTIVITY[op]
+    return fraction
+
+def selector_series(selector: Selector, series: dict) -> float:
+    # Estimated series one selector touches; at least one if the metric exists.
+    total = series.get(selector.metric, 0)
+    return max(1.0, total * matcher_selectivity(selector.matchers)) if total else 0.0
+
+def selector_samples(selector: Selector, series: dict) -> float:
+    # Range selectors read every sample in the window, instant ones the last.
+    window = max(1.0, (selector.range_seconds or 0) / SCRAPE_INTERVAL)
+    return selector_series(selector, series) * window
+
+def iter_panels(panels: list):
+    for panel in panels:
+        yield panel
+        # Collapsed rows keep their children in a nested "panels" list.
+        yield from iter_panels(panel.get("panels", []))
+
+def iter_targets(dashboard: dict):
+    panels = list(dashboard.get("panels", []))
+    for row in dashboard.get("rows", []):  # pre-5.0 schema
+        panels.extend(row.get("panels", []))
+
+    for panel in iter_panels(panels):
+        for target in panel.get("targets", []):
+            yield panel, target
 
 def api_get(path: str):
-    url = GRAFANA_URL.rstrip("/") + path
-    r = SESSION.get(url)
+    return default_client().get_json(path)
+
+def api_post(path: str, data: dict):
+    # Prometheus queries are read-only, so retrying them on 5xx is safe.
+    r = default_client().post(
+        path,
+        data=data,
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+        idempotent=True,
+    )
     r.raise_for_status()
     return r.json()
 
@@ -52,21 +216,71 @@ def fetch_all_metrics(prom_ds_id: int) -> set[str]:
     )
     return set(data["data"])
 
-def fetch_dashboard_metrics() -> set[str]:
-    used = set()
-    dashboards = api_get("/api/search?type=dash-db")
+def fetch_series_counts(prom_ds_id: int, metrics) -> dict[str, int]:
+    # One instant query per batch of names instead of one per metric; the
+    # alternation of literal names is matched by Prometheus' postings index.
+    names = sorted(metrics)
+    batches = [names[i:i + SERIES_BATCH_SIZE] for i in range(0, len(names), SERIES_BATCH_SIZE)]
+
+    def count_batch(batch):
+        query = 'count by (__name__) ({__name__=~"%s"})' % "|".join(batch)
+        data = api_post(f"/api/datasources/proxy/{prom_ds_id}/api/v1/query", {"query": query})
+        return {r["metric"]["__name__"]: int(float(r["value"][1])) for r in data["data"]["result"]}
+
+    async def run():
+        counts = dict.fromkeys(names, 0)
+        async for batch, result, error in default_client().fan_out(count_batch, batches, SERIES_WORKERS):
+            if error is not None:
+                raise error
+            counts.update(result)
+        return counts
+
+    return asyncio.run(run())
+
+def dashboard_usages(dashboard: dict):
+    for panel, target in iter_targets(dashboard):
+        expr = target.get("expr")
+        if not expr:
+            continue
+        for metric in extract_metrics(expr):
+            yield metric, panel.get("id"), panel.get("title"), expr
 
-    for d in dashboards:
-        dash = api_get(f"/api/dashboards/uid/{d['uid']}")
-        for panel in dash["dashboard"].get("panels", []):
-            for target in panel.get("targets", []):
-                expr = target.get("expr")
-                if expr:
-                    used |= extract_metrics(expr)
+def update_index(index: MetricIndex):
+    known = index.versions()
+    seen = set()
+    refreshed = 0
 
-    return used
+    for d in iter_dashboards():
+        uid = d["uid"]
+        seen.add(uid)
+
+        if uid in known and fetch_dashboard_version(uid) == known[uid]:
+            continue
+
+        # Deleted since the search; it is dropped from the index below.
+        payload = fetch_dashboard_by_uid(uid)
+        if payload is None:
+            seen.discard(uid)
+            continue
+
+        dashboard = payload["dashboard"]
+        index.replace_dashboard(uid, dashboard.get("title"), dashboard.get("version"), dashboard_usages(dashboard))
+        refreshed += 1
+
+    index.remove_dashboards(set(known) - seen)
+    print(f"Index updated: {refreshed} refreshed, {len(set(known) - seen)} removed, {len(seen)} total")
+
+def fetch_dashboard_metrics() -> set[str]:
+    index = MetricIndex()
+    try:
+        update_index(index)
+        return index.used_metrics()
+    finally:
+        index.close()
 
 def main():
+    default_client()
+
     print("Resolving Prometheus datasource...")
     prom_ds_id = get_default_prometheus_ds_id()
 
@@ -76,13 +290,24 @@ def main():
     print("Scanning dashboards...")
     used_metrics = fetch_dashboard_metrics()
 
-    unused_metrics = sorted(all_metrics - used_metrics)
+    unused = all_metrics - used_metrics
+
+    print(f"Counting series for {len(unused)} unused metrics...")
+    series = fetch_series_counts(prom_ds_id, unused)
+
+    unused_metrics = [
+        {"metric": m, "series": series[m], "estimated_bytes": series[m] * BYTES_PER_SERIES}
+        for m in sorted(unused, key=lambda m: (-series[m], m))
+    ]
+    unused_series = sum(series.values())
 
     report = {
         "summary": {
             "total_metrics": len(all_metrics),
             "used_metrics": len(used_metrics),
             "unused_metrics": len(unused_metrics),
+            "unused_series": unused_series,
+            "estimated_bytes_saved": unused_series * BYTES_PER_SERIES,
         },
         "unused_metrics": unused_metrics,
     }
@@ -94,6 +319,10 @@ def main():
     for k, v in report["summary"].items():
         print(f"{k}: {v}")
 
+    print("\n--- TOP UNUSED BY SERIES ---")
+    for item in unused_metrics[:10]:
+        print(f"{item['series']:>10}  {item['metric']}")
+
     print("\nUnused metrics written to unused_metrics_report.json")
 
 if __name__ == "__main__":
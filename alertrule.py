@@ -1,14 +1,103 @@
 import json
+import argparse
 
-with open("alert_rules.json", "r", encoding="utf-8") as f:
-    rules = json.load(f)
+from request.grafana_common import iter_json_array, parse_duration
 
-enabled_rules = [r for r in rules if r.get("enabled", True)]
+CHUNK_SIZE = 1 << 20
 
-print("Total rules:", len(rules))
-print("Enabled rules:", len(enabled_rules))
 
-with open("alert_rules_enabled.json", "w", encoding="utf-8") as f:
-    json.dump(enabled_rules, f, indent=2)
+def rule_fields(rule: dict) -> dict:
+    # Provisioning exports keep fields at the top level, ruler exports nest
+    # them under "grafana_alert"; merge so predicates work on both.
+    return {**rule.get("grafana_alert", {}), **{k: v for k, v in rule.items() if k != "grafana_alert"}}
 
-print("Saved filtered rules to alert_rules_enabled.json")
+
+def rule_interval(fields: dict):
+    if "intervalSeconds" in fields:
+        return float(fields["intervalSeconds"])
+    if "interval" in fields:
+        try:
+            return parse_duration(str(fields["interval"]))
+        except ValueError:
+            return None
+    return None
+
+
+def build_predicate(args):
+    labels = dict(item.split("=", 1) for item in args.label)
+    min_interval, max_interval = args.min_interval, args.max_interval
+
+    def matches(rule: dict) -> bool:
+        if not rule.get("enabled", True):
+            return False
+
+        fields = rule_fields(rule)
+
+        if args.folder:
+            folder_ids = {fields.get(k) for k in ("folderUID", "folderName", "folderTitle", "namespace_uid")}
+            if not folder_ids & set(args.folder):
+                return False
+
+        rule_labels = fields.get("labels") or {}
+        if any(rule_labels.get(k) != v for k, v in labels.items()):
+            return False
+
+        if args.datasource:
+            used = {q.get("datasourceUid") for q in fields.get("data", [])}
+            if not used & set(args.datasource):
+                return False
+
+        if min_interval is not None or max_interval is not None:
+            interval = rule_interval(fields)
+            if interval is None:
+                return False
+            if min_interval is not None and interval < min_interval:
+                return False
+            if max_interval is not None and interval > max_interval:
+                return False
+
+        return True
+
+    return matches
+
+
+def write_item(out, item, first: bool):
+    # Same layout json.dump(list, indent=2) produces, one element at a time.
+    text = json.dumps(item, indent=2).replace("\n", "\n  ")
+    out.write(("[\n  " if first else ",\n  ") + text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filter enabled alert rules from a (large) JSON export")
+    parser.add_argument("--input", default="alert_rules.json")
+    parser.add_argument("--output", default="alert_rules_enabled.json")
+    parser.add_argument("--folder", action="append", default=[], help="folder uid or title (repeatable)")
+    parser.add_argument("--label", action="append", default=[], help="label key=value that must match (repeatable)")
+    parser.add_argument("--datasource", action="append", default=[], help="datasource uid used by a query (repeatable)")
+    parser.add_argument("--min-interval", type=parse_duration, help="minimum evaluation interval, e.g. 30s or 1m")
+    parser.add_argument("--max-interval", type=parse_duration, help="maximum evaluation interval, e.g. 5m")
+    args = parser.parse_args()
+
+    for item in args.label:
+        if "=" not in item:
+            raise SystemExit(f"Invalid label format: {item}")
+
+    matches = build_predicate(args)
+    total = kept = 0
+
+    with open(args.input, "r", encoding="utf-8") as f, open(args.output, "w", encoding="utf-8") as out:
+        for rule in iter_json_array(iter(lambda: f.read(CHUNK_SIZE), "")):
+            total += 1
+            if matches(rule):
+                write_item(out, rule, kept == 0)
+                kept += 1
+        out.write("\n]" if kept else "[]")
+
+    print("Total rules:", total)
+    print("Matching rules:", kept)
+
+    print(f"Saved filtered rules to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
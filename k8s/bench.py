@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+from fake_apiserver import FakeApiServer
+from kube_client import KubeClient
+from informer import Informer
+from crashingpods import is_crashing
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from request.fake_server import run_script
+
+# Offline benchmark for the k8s scripts against fake_apiserver.py:
+#
+#   python k8s/bench.py --namespaces 300 --deployments 10 --replicas 5 --latency-ms 5
+#
+# The informer scenario compares answering per-namespace pod queries from the
+# cache with re-listing for every query, and measures how long a crash loop
+# takes to reach a watch handler. The script scenarios run as subprocesses
+# in a scratch directory, like Grafana/bench.py.
+
+HERE = Path(__file__).resolve().parent
+
+SCRIPTS = {
+    "scale_down_all_deployments": [],
+    "restore": [],
+    "crashingpods": ["--namespace", "team-000", "--dry-run"],
+}
+
+
+def bench_informer(fake: FakeApiServer, client: KubeClient, queries: int) -> list:
+    namespaces = sorted({ns for ns, _ in fake.objects["pods"]})
+    picks = [namespaces[i % len(namespaces)] for i in range(queries)]
+    results = []
+
+    fake.reset_stats()
+    start = time.perf_counter()
+    for ns in picks:
+        client.list(f"/api/v1/namespaces/{ns}/pods")
+    results.append(("list per query", time.perf_counter() - start, fake.stats()["requests"]))
+
+    fake.reset_stats()
+    start = time.perf_counter()
+    pods = Informer(client, "pods").start()
+    synced = time.perf_counter() - start
+    for ns in picks:
+        [p for p in pods.list(namespace=ns) if is_crashing(p)]
+    results.append(("informer", time.perf_counter() - start, fake.stats()["requests"]))
+
+    seen = {}
+    done = threading.Event()
+
+    def handler(changes):
+        for event, obj, old in changes:
+            if is_crashing(obj) and not (old and is_crashing(old)):
+                seen[obj["metadata"]["name"]] = time.perf_counter()
+        if len(seen) >= 10:
+            done.set()
+
+    pods.add_handler(handler)
+    injected = time.perf_counter()
+    fake.crash_random(10)
+    done.wait(10)
+    pods.stop.set()
+    latency = max(seen.values()) - injected if seen else float("nan")
+
+    print(f"\nInformer: {len(pods.objects)} pods synced in {synced:.2f}s; "
+          f"crash loop → handler in {latency * 1000:.1f}ms (worst of {len(seen)})")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the k8s scripts against a fake API server")
+    parser.add_argument("--namespaces", type=int, default=100)
+    parser.add_argument("--deployments", type=int, default=5, help="deployments per namespace")
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--statefulsets", type=int, default=1, help="statefulsets per namespace")
+    parser.add_argument("--crashing", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--queries", type=int, default=200, help="per-namespace pod queries for the informer")
+    parser.add_argument("--scripts", nargs="*", choices=list(SCRIPTS), default=list(SCRIPTS))
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    fake = FakeApiServer(args.namespaces, args.deployments, args.replicas, args.statefulsets, args.crashing,
+                         args.latency_ms)
+    server = fake.serve()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    client = KubeClient(url)
+    workdir = Path(tempfile.mkdtemp(prefix="k8s-bench-"))
+    env = dict(os.environ, KUBE_API_URL=url)
+    results = []
+
+    try:
+        for name, elapsed, requests in bench_informer(fake, client, args.queries):
+            results.append({"scenario": name, "seconds": round(elapsed, 3), "requests": requests})
+
+        for name in args.scripts:
+            fake.reset_stats()
+            code, elapsed, rss_mb, stderr = run_script(HERE / f"{name}.py", SCRIPTS[name], env, workdir)
+            stats = fake.stats()
+            results.append({"scenario": name, "seconds": round(elapsed, 3), "requests": stats["requests"],
+                            "p50_ms": stats["p50_ms"], "p99_ms": stats["p99_ms"], "peak_rss_mb": round(rss_mb, 1)})
+            if code != 0:
+                print(f"{name} exited with {code}:\n{stderr}", file=sys.stderr)
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{len(fake.objects['pods'])} pods, {len(fake.objects['deployments'])} deployments, "
+          f"{len(fake.objects['statefulsets'])} statefulsets, {args.latency_ms}ms latency")
+    header = f"{'scenario':<28} {'sec':>8} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'rss MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['scenario']:<28} {r['seconds']:>8} {r['requests']:>9} {r.get('p50_ms', ''):>8} "
+              f"{r.get('p99_ms', ''):>8} {r.get('peak_rss_mb', ''):>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
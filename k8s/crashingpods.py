@@ -1,35 +1,114 @@
-import subprocess
 import json
+import time
+import queue
+import argparse
+import threading
+
+from kube_client import configure
+from informer import Informer
+from remediation import Remediator, pod_key, print_report
+from log_capture import CAPTURE_DIR, LogCapture
 
 NAMESPACE = "default" 
 
-def get_pods(namespace):
-    cmd = [
-        "kubectl", "get", "pods",
-        "-n", namespace,
-        "-o", "json"
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return json.loads(result.stdout)["items"]
+def get_pods(client, namespace):
+    return Informer(client, "pods", namespace).sync().list()
 
-def is_crashing(pod):
-    statuses = pod["status"].get("containerStatuses", [])
-    for c in statuses:
+def container_states(pod):
+    # {container: "running" | "terminated" | waiting reason}
+    states = {}
+    if pod is None:
+        return states
+    for c in pod["status"].get("containerStatuses", []):
         state = c.get("state", {})
-        if "waiting" in state and state["waiting"].get("reason") == "CrashLoopBackOff":
-            return True
-    return False
-
-def delete_pod(name, namespace):
-    subprocess.run([
-        "kubectl", "delete", "pod",
-        name, "-n", namespace
-    ])
-
-pods = get_pods(NAMESPACE)
-
-for pod in pods:
-    name = pod["metadata"]["name"]
-    if is_crashing(pod):
-        print(f"Deleting crashing pod: {name}")
-        delete_pod(name, NAMESPACE)
+        if "waiting" in state:
+            states[c["name"]] = state["waiting"].get("reason", "waiting")
+        else:
+            states[c["name"]] = next(iter(state), "unknown")
+    return states
+
+def is_crashing(pod):
+    return "CrashLoopBackOff" in container_states(pod).values()
+
+def run_once(client, namespace, remediator):
+    pods = get_pods(client, namespace)
+    crashing = [pod for pod in pods if is_crashing(pod)]
+    return remediator.remediate(crashing)
+
+def crashing_containers(pod):
+    return {c for c, reason in container_states(pod).items() if reason == "CrashLoopBackOff"}
+
+class CrashWatcher:
+    # Follows a pod informer. on_crash(pods) fires with the pods that have a
+    # container newly in CrashLoopBackOff, not on every event of an already
+    # crashing pod; a (re)list reports all of them in one call.
+
+    def __init__(self, pods, on_crash):
+        self.pods = pods
+        self.on_crash = on_crash
+        pods.add_handler(self.handle)
+
+    def handle(self, changes):
+        started = [
+            obj for event, obj, old in changes
+            if event != "DELETED" and crashing_containers(obj) - crashing_containers(old)
+        ]
+        if started:
+            self.on_crash(started)
+
+class RemediationWorker:
+    # Remediates crashing pods on its own thread, so log capture and deletes
+    # never hold up the informer's watch. Batches that arrive while one is
+    # being handled are merged into the next run.
+
+    def __init__(self, remediator):
+        self.remediator = remediator
+        self.queue = queue.Queue()
+        threading.Thread(target=self.run, daemon=True, name="remediation").start()
+
+    def submit(self, pods):
+        self.queue.put(pods)
+
+    def run(self):
+        while True:
+            pods = {pod_key(p): p for p in self.queue.get()}
+            while not self.queue.empty():
+                pods.update((pod_key(p), p) for p in self.queue.get_nowait())
+            print(f"{time.strftime('%H:%M:%S')} {len(pods)} pod(s) entered CrashLoopBackOff")
+            try:
+                print_report(self.remediator.remediate(list(pods.values())))
+            except Exception as e:
+                print(f"Remediation failed: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete pods stuck in CrashLoopBackOff")
+    parser.add_argument("--namespace", help=f"namespace to check (default: {NAMESPACE}; all namespaces with --watch)")
+    parser.add_argument("--watch", action="store_true", help="keep running and react to new crash loops")
+    parser.add_argument("--api-url", help="Kubernetes API URL (default: KUBE_API_URL or kubectl proxy)")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be deleted without deleting")
+    parser.add_argument("--report", help="also write the remediation report as JSON (one-shot mode)")
+    parser.add_argument("--log-dir", default=CAPTURE_DIR, help="where previous logs are saved before deleting")
+    parser.add_argument("--no-logs", action="store_true", help="delete without saving previous logs")
+    args = parser.parse_args()
+
+    client = configure(args.api_url)
+    capture = None if args.no_logs else LogCapture(client, args.log_dir)
+    remediator = Remediator(client, dry_run=args.dry_run, capture=capture)
+
+    if not args.watch:
+        report = run_once(client, args.namespace or NAMESPACE, remediator)
+        print_report(report)
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump(report, f, indent=2)
+        return
+
+    pods = Informer(client, "pods", args.namespace)
+    CrashWatcher(pods, RemediationWorker(remediator).submit)
+    try:
+        pods.run()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from request.fake_server import FakeServer
+
+# In-process stand-in for the Kubernetes API endpoints used by the scripts in
+# this directory: paginated lists, watches with resourceVersion resumption,
+# bookmarks and 410 expiry, merge and apply patches, deletes with ReplicaSet
+# replacement, deployment readiness and previous-container logs. It can
+# inject latency and crash-looping pods. Can be started on its own:
+#
+#   python k8s/fake_apiserver.py --port 8001 --namespaces 300 --deployments 10
+#   KUBE_API_URL=http://127.0.0.1:8001 python k8s/crashingpods.py --watch
+
+GROUPS = {
+    "namespaces": "/api/v1",
+    "pods": "/api/v1",
+    "secrets": "/api/v1",
+    "deployments": "/apis/apps/v1",
+    "statefulsets": "/apis/apps/v1",
+    "replicasets": "/apis/apps/v1",
+}
+API_VERSIONS = {"/api/v1": "v1", "/apis/apps/v1": "apps/v1"}
+KINDS = {
+    "namespaces": "Namespace", "pods": "Pod", "secrets": "Secret",
+    "deployments": "Deployment", "statefulsets": "StatefulSet", "replicasets": "ReplicaSet",
+}
+
+PATH_REGEX = re.compile(
+    r"^/(?:api/v1|apis/apps/v1)(?:/namespaces/(?P<ns>[^/]+))?/(?P<plural>[a-z]+)"
+    r"(?:/(?P<name>[^/]+))?(?:/(?P<sub>log|status))?$"
+)
+
+WATCH_WINDOW = 10000
+BOOKMARK_INTERVAL = 5.0
+
+
+def merge_patch(target, patch):
+    # RFC 7386: null deletes a key, objects merge recursively, anything else replaces.
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def label_matches(labels: dict, selector: str) -> bool:
+    for term in filter(None, selector.split(",")):
+        key, _, value = term.partition("=")
+        if labels.get(key) != value.lstrip("="):
+            return False
+    return True
+
+
+class FakeApiServer(FakeServer):
+    def __init__(self, namespaces: int = 10, deployments: int = 5, replicas: int = 2, statefulsets: int = 1,
+                 crashing: int = 0, latency_ms: float = 0.0, ready_delay: float = 0.2, log_bytes: int = 64 * 1024,
+                 seed: int = 1):
+        super().__init__()
+        self.rng = random.Random(seed)
+        self.latency = latency_ms / 1000.0
+        self.ready_delay = ready_delay
+        self.log_bytes = log_bytes
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+
+        self.rv = 0
+        self.events = deque(maxlen=WATCH_WINDOW)
+        self.objects = {plural: {} for plural in GROUPS}
+        self.counter = 0
+
+        for n in range(namespaces):
+            ns = f"team-{n:03d}"
+            self.create("namespaces", None, {"metadata": {"name": ns, "labels": {"team": ns}}})
+            for d in range(deployments):
+                self.create_deployment(ns, f"app-{d:02d}", replicas, tier="db" if d == 0 else "web")
+            for s in range(statefulsets):
+                self.create_workload("statefulsets", ns, f"db-{s:02d}", replicas, tier="db")
+
+        for pod in self.rng.sample(list(self.objects["pods"].values()), min(crashing, len(self.objects["pods"]))):
+            self.crash(pod)
+
+    # --- object store -------------------------------------------------------
+
+    def next_uid(self) -> str:
+        self.counter += 1
+        return f"00000000-0000-0000-0000-{self.counter:012d}"
+
+    def emit(self, plural: str, kind: str, obj: dict):
+        # Caller holds the lock; every change gets the next resourceVersion.
+        self.rv += 1
+        obj["metadata"]["resourceVersion"] = str(self.rv)
+        self.events.append((self.rv, plural, kind, json.loads(json.dumps(obj))))
+        self.changed.notify_all()
+
+    def create(self, plural: str, ns, obj: dict) -> dict:
+        with self.lock:
+            obj = {"apiVersion": API_VERSIONS[GROUPS[plural]], "kind": KINDS[plural], **obj}
+            meta = obj["metadata"]
+            meta.setdefault("uid", self.next_uid())
+            meta.setdefault("generation", 1)
+            meta.setdefault("creationTimestamp", "2024-01-01T00:00:00Z")
+            if ns is not None:
+                meta["namespace"] = ns
+            self.objects[plural][(ns, meta["name"])] = obj
+            self.emit(plural, "ADDED", obj)
+            return obj
+
+    def modify(self, plural: str, obj: dict):
+        with self.lock:
+            self.emit(plural, "MODIFIED", obj)
+
+    def remove(self, plural: str, ns, name: str):
+        with self.lock:
+            obj = self.objects[plural].pop((ns, name), None)
+            if obj is not None:
+                self.emit(plural, "DELETED", obj)
+            return obj
+
+    # --- workloads ----------------------------------------------------------
+
+    def make_pod(self, ns: str, owner: dict, labels: dict) -> dict:
+        suffix = "".join(self.rng.choice("bcdfghjklmnpqrstvwxz2456789") for _ in range(5))
+        name = owner["metadata"]["name"] + "-" + suffix
+        return self.create("pods", ns, {
+            "metadata": {
+                "name": name,
+                "labels": dict(labels),
+                "ownerReferences": [{"apiVersion": "apps/v1", "kind": owner["kind"], "name": owner["metadata"]["name"],
+                                     "uid": owner["metadata"]["uid"], "controller": True}],
+            },
+            "spec": {"containers": [{"name": "app", "image": "app:1"}]},
+            "status": {"phase": "Running", "containerStatuses": [
+                {"name": "app", "ready": True, "restartCount": 0, "state": {"running": {}}},
+            ]},
+        })
+
+    def create_workload(self, plural: str, ns: str, name: str, replicas: int, tier: str) -> dict:
+        labels = {"app": name, "tier": tier}
+        workload = self.create(plural, ns, {
+            "metadata": {"name": name, "labels": labels},
+            "spec": {"replicas": replicas, "selector": {"matchLabels": {"app": name}},
+                     "template": {"metadata": {"labels": labels}}},
+            "status": {"observedGeneration": 1, "replicas": replicas, "readyReplicas": replicas,
+                       "availableReplicas": replicas, "updatedReplicas": replicas},
+        })
+        if plural == "statefulsets":
+            for _ in range(replicas):
+                self.make_pod(ns, workload, labels)
+        return workload
+
+    def create_deployment(self, ns: str, name: str, replicas: int, tier: str):
+        deployment = self.create_workload("deployments", ns, name, replicas, tier)
+        rs = self.create("replicasets", ns, {
+            "metadata": {"name": f"{name}-7d9f8b6c5", "labels": {"app": name},
+                         "ownerReferences": [{"apiVersion": "apps/v1", "kind": "Deployment", "name": name,
+                                              "uid": deployment["metadata"]["uid"], "controller": True}]},
+            "spec": {"replicas": replicas},
+        })
+        for _ in range(replicas):
+            self.make_pod(ns, rs, deployment["metadata"]["labels"])
+
+    def crash(self, pod: dict):
+        with self.lock:
+            status = pod["status"]["containerStatuses"][0]
+            status["restartCount"] += 5
+            status["ready"] = False
+            status["state"] = {"waiting": {"reason": "CrashLoopBackOff",
+                                           "message": "back-off 5m0s restarting failed container"}}
+            status["lastState"] = {"terminated": {"exitCode": 1, "reason": "Error"}}
+            self.modify("pods", pod)
+
+    def crash_random(self, count: int) -> list:
+        with self.lock:
+            healthy = [p for p in self.objects["pods"].values() if "running" in
+                       p["status"]["containerStatuses"][0]["state"]]
+            picked = self.rng.sample(healthy, min(count, len(healthy)))
+            for pod in picked:
+                self.crash(pod)
+            return [f"{p['metadata']['namespace']}/{p['metadata']['name']}" for p in picked]
+
+    def set_ready(self, plural: str, ns: str, name: str, generation: int):
+        with self.lock:
+            obj = self.objects[plural].get((ns, name))
+            if obj is None or obj["metadata"]["generation"] != generation:
+                return
+            replicas = obj["spec"].get("replicas", 1)
+            obj["status"].update(readyReplicas=replicas, availableReplicas=replicas, updatedReplicas=replicas)
+            self.modify(plural, obj)
+
+    # --- endpoint handlers: return (status, body) ---------------------------
+
+    def list(self, plural: str, ns, query: dict):
+        limit = int(query.get("limit", ["0"])[0])
+        offset = int(query.get("continue", ["0"])[0] or 0)
+        selector = query.get("labelSelector", [""])[0]
+        with self.lock:
+            items = [
+                obj for (obj_ns, _), obj in sorted(self.objects[plural].items(), key=lambda kv: (kv[0][0] or "", kv[0][1]))
+                if (ns is None or obj_ns == ns) and label_matches(obj["metadata"].get("labels", {}), selector)
+            ]
+            rv = str(self.rv)
+        page = items[offset:offset + limit] if limit else items[offset:]
+        metadata = {"resourceVersion": rv}
+        if limit and offset + limit < len(items):
+            metadata["continue"] = str(offset + limit)
+        return 200, {"kind": KINDS[plural] + "List", "metadata": metadata, "items": page}
+
+    def get(self, plural: str, ns, name: str):
+        with self.lock:
+            obj = self.objects[plural].get((ns, name))
+        if obj is None:
+            return 404, {"kind": "Status", "code": 404, "reason": "NotFound", "message": f"{plural} \"{name}\" not found"}
+        return 200, obj
+
+    def delete(self, plural: str, ns, name: str):
+        with self.lock:
+            obj = self.remove(plural, ns, name)
+            if obj is None:
+                return self.get(plural, ns, name)
+            owner = next(iter(obj["metadata"].get("ownerReferences", [])), None)
+            if plural == "pods" and owner is not None:
+                parent = self.objects[owner["kind"].lower() + "s"].get((ns, owner["name"]))
+                if parent is not None:
+                    self.make_pod(ns, parent, obj["metadata"].get("labels", {}))
+        return 200, obj
+
+    def patch(self, plural: str, ns, name: str, content_type: str, body: dict, query: dict):
+        with self.lock:
+            obj = self.objects[plural].get((ns, name))
+            if obj is None:
+                if not content_type.startswith("application/apply-patch"):
+                    return self.get(plural, ns, name)
+                body.setdefault("metadata", {})["name"] = name
+                return 201, self.create(plural, ns, {k: v for k, v in body.items() if k not in ("apiVersion", "kind")})
+
+            old_spec = obj.get("spec")
+            patched = merge_patch(obj, {k: v for k, v in body.items() if k not in ("apiVersion", "kind")})
+            obj.clear()
+            obj.update(patched)
+
+            if plural in ("deployments", "statefulsets") and obj.get("spec") != old_spec:
+                obj["metadata"]["generation"] += 1
+                generation = obj["metadata"]["generation"]
+                replicas = obj["spec"].get("replicas", 1)
+                obj["status"]["observedGeneration"] = generation
+                obj["status"]["replicas"] = replicas
+                if replicas == 0:
+                    obj["status"].update(readyReplicas=0, availableReplicas=0, updatedReplicas=0)
+                else:
+                    timer = threading.Timer(self.ready_delay * self.rng.uniform(0.5, 1.5), self.set_ready,
+                                            (plural, ns, name, generation))
+                    timer.daemon = True
+                    timer.start()
+            self.modify(plural, obj)
+        return 200, obj
+
+    def post(self, plural: str, ns, body: dict):
+        name = body.get("metadata", {}).get("name")
+        with self.lock:
+            if (ns, name) in self.objects[plural]:
+                return 409, {"kind": "Status", "code": 409, "reason": "AlreadyExists",
+                             "message": f"{plural} \"{name}\" already exists"}
+            return 201, self.create(plural, ns, {k: v for k, v in body.items() if k not in ("apiVersion", "kind")})
+
+    def logs(self, ns: str, name: str, query: dict):
+        with self.lock:
+            pod = self.objects["pods"].get((ns, name))
+        if pod is None:
+            return 404, None
+        if query.get("previous", ["false"])[0] == "true" and pod["status"]["containerStatuses"][0]["restartCount"] == 0:
+            return 400, None
+        size = min(self.log_bytes, int(query.get("limitBytes", [str(self.log_bytes)])[0]))
+        line = f"{ns}/{name} panic: synthetic failure\n".encode()
+        return 200, (line * (size // len(line) + 1))[:size]
+
+    # --- server -------------------------------------------------------------
+
+    def watch(self, handler, plural: str, ns, query: dict):
+        since = int(query.get("resourceVersion", ["0"])[0] or 0)
+        deadline = time.monotonic() + float(query.get("timeoutSeconds", ["300"])[0])
+        bookmarks = query.get("allowWatchBookmarks", ["false"])[0] == "true"
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def send(event: dict):
+            data = json.dumps(event).encode() + b"\n"
+            handler.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            handler.wfile.flush()
+
+        try:
+            with self.lock:
+                oldest = self.events[0][0] if self.events else self.rv + 1
+            if since and since < oldest - 1:
+                send({"type": "ERROR", "object": {"kind": "Status", "code": 410, "reason": "Expired",
+                                                  "message": f"too old resource version: {since} ({oldest - 1})"}})
+            else:
+                last_bookmark = time.monotonic()
+                while time.monotonic() < deadline:
+                    with self.lock:
+                        pending = [e for e in self.events if e[0] > since]
+                        if not pending:
+                            self.changed.wait(min(1.0, max(0.0, deadline - time.monotonic())))
+                            pending = [e for e in self.events if e[0] > since]
+                        current = self.rv
+                    for rv, event_plural, kind, obj in pending:
+                        since = rv
+                        if event_plural == plural and (ns is None or obj["metadata"].get("namespace") == ns):
+                            send({"type": kind, "object": obj})
+                    if bookmarks and time.monotonic() - last_bookmark > BOOKMARK_INTERVAL:
+                        send({"type": "BOOKMARK", "object": {"kind": KINDS[plural],
+                                                             "metadata": {"resourceVersion": str(current)}}})
+                        last_bookmark = time.monotonic()
+            handler.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            handler.close_connection = True
+
+    def respond(self, handler, method: str, path: str, query: dict, body):
+        if path == "/__fake/crash":
+            return None, 200, self.crash_random(int(query.get("count", ["1"])[0]))
+        m = PATH_REGEX.match(path)
+        if m is None or m.group("plural") not in GROUPS:
+            return "unknown", 404, {"kind": "Status", "code": 404, "message": "Not found"}
+
+        plural, ns, name, sub = m.group("plural", "ns", "name", "sub")
+        if plural == "namespaces":
+            ns = None
+        key = f"{plural}{'/' + sub if sub else ''}{'' if name else ' list'}"
+
+        if method == "GET" and name is None and query.get("watch", ["0"])[0] in ("1", "true"):
+            self.record(f"WATCH {plural}", self.latency)
+            self.watch(handler, plural, ns, query)
+            return None
+        if sub == "log":
+            status, payload = self.logs(ns, name, query)
+            return key, status, payload if status == 200 else {"kind": "Status", "code": status}
+
+        if method == "GET":
+            status, payload = self.list(plural, ns, query) if name is None else self.get(plural, ns, name)
+        elif method == "DELETE":
+            status, payload = self.delete(plural, ns, name)
+        elif method == "PATCH":
+            status, payload = self.patch(plural, ns, name, handler.headers.get("Content-Type", ""), body or {}, query)
+        elif method == "POST":
+            status, payload = self.post(plural, ns, body or {})
+        else:
+            status, payload = 405, {"kind": "Status", "code": 405}
+        return key, status, payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Kubernetes API server for offline tests and benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--namespaces", type=int, default=10)
+    parser.add_argument("--deployments", type=int, default=5, help="deployments per namespace")
+    parser.add_argument("--replicas", type=int, default=2)
+    parser.add_argument("--statefulsets", type=int, default=1, help="statefulsets per namespace")
+    parser.add_argument("--crashing", type=int, default=0, help="pods to start in CrashLoopBackOff")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean injected latency per request")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    fake = FakeApiServer(args.namespaces, args.deployments, args.replicas, args.statefulsets, args.crashing,
+                         args.latency_ms, seed=args.seed)
+    print(f"Fake Kubernetes API on http://{args.host}:{args.port} "
+          f"({len(fake.objects['pods'])} pods, {len(fake.objects['deployments'])} deployments)")
+    fake.serve_forever(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import time
+import threading
+from collections import defaultdict
+
+# Shared, in-process cache of one Kubernetes resource, filled by a single list
+# and kept current by a watch (see KubeClient.list_watch). Objects are indexed
+# by namespace, controlling owner and label, so the scripts can answer their
+# queries locally instead of re-listing (or shelling out to kubectl):
+#
+#   pods = Informer(client, "pods")
+#   pods.start()                                   # list, then watch in the background
+#   pods.list(namespace="team-a", labels={"app": "api"})
+#   pods.list(owner=("team-a", "ReplicaSet", "api-7d9f8b6c5"))
+#
+# sync() does the list without a watch, for one-shot scripts.
+
+RESOURCES = {
+    "namespaces": "/api/v1/namespaces",
+    "pods": "/api/v1/pods",
+    "deployments": "/apis/apps/v1/deployments",
+    "statefulsets": "/apis/apps/v1/statefulsets",
+    "replicasets": "/apis/apps/v1/replicasets",
+}
+
+
+def object_key(obj: dict) -> tuple:
+    meta = obj["metadata"]
+    return meta.get("namespace"), meta["name"]
+
+
+def controller_of(obj: dict):
+    meta = obj["metadata"]
+    refs = meta.get("ownerReferences", [])
+    owner = next((r for r in refs if r.get("controller")), refs[0] if refs else None)
+    return (meta.get("namespace"), owner["kind"], owner["name"]) if owner else None
+
+
+class Informer:
+    def __init__(self, client, resource: str, namespace: str = None, label_selector: str = None):
+        self.client = client
+        self.resource = resource
+        path = RESOURCES[resource]
+        if namespace:
+            prefix, plural = path.rsplit("/", 1)
+            path = f"{prefix}/namespaces/{namespace}/{plural}"
+        self.path = path
+        self.params = {"labelSelector": label_selector} if label_selector else None
+
+        self.objects = {}
+        self.by_namespace = defaultdict(set)
+        self.by_owner = defaultdict(set)
+        self.by_label = defaultdict(set)
+
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.synced = threading.Event()
+        self.stop = threading.Event()
+        self.handlers = []
+
+    def add_handler(self, fn):
+        # fn(changes) gets a list of (event, obj, old) after every relist and
+        # for each watch event; old is None for new objects.
+        self.handlers.append(fn)
+
+    # --- cache maintenance --------------------------------------------------
+
+    def _index(self, key, obj, add: bool):
+        entries = [(self.by_namespace, key[0])]
+        owner = controller_of(obj)
+        if owner:
+            entries.append((self.by_owner, owner))
+        entries += [(self.by_label, label) for label in obj["metadata"].get("labels", {}).items()]
+        for index, value in entries:
+            if add:
+                index[value].add(key)
+                continue
+            # Empty buckets are dropped so churning owners and labels (e.g.
+            # pod-template-hash) do not accumulate.
+            bucket = index.get(value)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del index[value]
+
+    def _put(self, obj):
+        key = object_key(obj)
+        old = self.objects.get(key)
+        if old is not None:
+            self._index(key, old, False)
+        self.objects[key] = obj
+        self._index(key, obj, True)
+        return old
+
+    def _drop(self, key):
+        old = self.objects.pop(key, None)
+        if old is not None:
+            self._index(key, old, False)
+        return old
+
+    def _replace(self, items) -> list:
+        changes = []
+        seen = set()
+        for obj in items:
+            seen.add(object_key(obj))
+            old = self._put(obj)
+            changes.append(("MODIFIED" if old is not None else "ADDED", obj, old))
+        for key in set(self.objects) - seen:
+            old = self._drop(key)
+            changes.append(("DELETED", old, old))
+        return changes
+
+    def _apply(self, event: str, obj):
+        with self.changed:
+            if event == "SYNC":
+                changes = self._replace(obj)
+                self.synced.set()
+            elif event == "DELETED":
+                changes = [("DELETED", obj, self._drop(object_key(obj)))]
+            else:
+                changes = [(event, obj, self._put(obj))]
+            self.changed.notify_all()
+
+        for handler in self.handlers:
+            handler(changes)
+
+    def sync(self):
+        items, _ = self.client.list(self.path, self.params)
+        self._apply("SYNC", items)
+        return self
+
+    def run(self):
+        # Blocks, following the watch until stop is set.
+        for event, obj in self.client.list_watch(self.path, self.params, stop=self.stop):
+            self._apply(event, obj)
+
+    def start(self, timeout: float = None):
+        threading.Thread(target=self.run, daemon=True, name=f"informer-{self.resource}").start()
+        if not self.synced.wait(timeout):
+            raise TimeoutError(f"{self.resource} informer did not sync within {timeout}s")
+        return self
+
+    # --- queries ------------------------------------------------------------
+
+    def get(self, namespace, name):
+        with self.lock:
+            return self.objects.get((namespace, name))
+
+    def list(self, namespace: str = None, owner: tuple = None, labels: dict = None) -> list:
+        with self.lock:
+            keys = None
+            if namespace is not None:
+                keys = set(self.by_namespace.get(namespace, ()))
+            if owner is not None:
+                found = self.by_owner.get(owner, set())
+                keys = found.copy() if keys is None else keys & found
+            for label in (labels or {}).items():
+                found = self.by_label.get(label, set())
+                keys = found.copy() if keys is None else keys & found
+            if keys is None:
+                return list(self.objects.values())
+            return [self.objects[k] for k in sorted(keys, key=lambda k: (k[0] or "", k[1]))]
+
+    def wait_for(self, predicate, timeout: float) -> bool:
+        # Waits until predicate(informer) holds; False if the timeout expired first.
+        deadline = time.monotonic() + timeout
+        with self.changed:
+            while True:
+                if predicate(self):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.changed.wait(remaining)
@@ -0,0 +1,150 @@
+import os
+import re
+import sys
+import json
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from request.grafana_api_client import GrafanaClient
+
+# Pooled Kubernetes API client. It reuses the retry, concurrency-limit and
+# latency bookkeeping of the Grafana client and adds paginated lists and
+# watches. By default it talks to `kubectl proxy`; KUBE_TOKEN is only needed
+# when KUBE_API_URL points at the API server directly. TLS is verified against
+# the system CAs, or KUBE_CA_CERT; KUBE_INSECURE=1 turns verification off.
+
+API_URL = os.getenv("KUBE_API_URL", "http://127.0.0.1:8001")
+TOKEN = os.getenv("KUBE_TOKEN")
+MAX_CONCURRENCY = max(1, int(os.getenv("KUBE_MAX_CONCURRENCY", "16")))
+PAGE_SIZE = int(os.getenv("KUBE_PAGE_SIZE", "500"))
+WATCH_TIMEOUT = int(os.getenv("KUBE_WATCH_TIMEOUT", "300"))
+CA_CERT = os.getenv("KUBE_CA_CERT")
+INSECURE = os.getenv("KUBE_INSECURE", "").lower() in ("1", "true", "yes")
+# requests' verify: a CA bundle path, True for the system CAs, or False.
+VERIFY = False if INSECURE else CA_CERT or True
+
+ENDPOINT_PATTERNS = [
+    (re.compile(r"/namespaces/[^/]+"), "/namespaces/{ns}"),
+    (re.compile(r"/(pods|deployments|statefulsets|replicasets|secrets)/[^/]+"), r"/\1/{name}"),
+]
+
+
+def endpoint_key(path: str) -> str:
+    path = path.split("?", 1)[0]
+    for pattern, replacement in ENDPOINT_PATTERNS:
+        path = pattern.sub(replacement, path)
+    return path
+
+
+class WatchExpired(Exception):
+    # The resourceVersion is older than the API server's watch cache (410 Gone).
+    pass
+
+
+class KubeClient(GrafanaClient):
+    endpoint_key = staticmethod(endpoint_key)
+    api_name = "KUBERNETES"
+
+    def __init__(self, url: str = API_URL, token: str = TOKEN, max_concurrency: int = MAX_CONCURRENCY,
+                 verify=VERIFY, **kwargs):
+        super().__init__(url, token or "", max_concurrency=max_concurrency, verify=verify, **kwargs)
+        if not token:
+            del self.session.headers["Authorization"]
+
+    def patch(self, path: str, body: dict, content_type: str = "application/merge-patch+json", **kwargs):
+        return self.request("PATCH", path, data=json.dumps(body), headers={"Content-Type": content_type}, **kwargs)
+
+    def iter_pages(self, path: str, params: dict = None, page_size: int = PAGE_SIZE, **kwargs):
+        # Yields each page of a list; the last one carries the resourceVersion to watch from.
+        params = dict(params or {}, limit=page_size)
+        while True:
+            page = self.get_json(path, params=params, **kwargs)
+            yield page
+            token = page.get("metadata", {}).get("continue")
+            if not token:
+                return
+            params["continue"] = token
+
+    def list(self, path: str, params: dict = None, page_size: int = PAGE_SIZE) -> tuple:
+        items, resource_version = [], None
+        for page in self.iter_pages(path, params, page_size):
+            items.extend(page.get("items", []))
+            resource_version = page.get("metadata", {}).get("resourceVersion")
+        return items, resource_version
+
+    def watch(self, path: str, resource_version: str, params: dict = None, timeout_seconds: int = WATCH_TIMEOUT):
+        params = dict(
+            params or {},
+            watch="1",
+            resourceVersion=resource_version,
+            allowWatchBookmarks="true",
+            timeoutSeconds=timeout_seconds,
+        )
+        r = self.get(path, params=params, stream=True, timeout=(self.timeout, timeout_seconds + self.timeout))
+        if r.status_code == 410:
+            raise WatchExpired(r.text)
+        r.raise_for_status()
+
+        with r:
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["type"] == "ERROR":
+                    status = event.get("object", {})
+                    if status.get("code") == 410:
+                        raise WatchExpired(status.get("message"))
+                    raise RuntimeError(f"Watch failed: {status.get('message', status)}")
+                yield event
+
+    def list_watch(self, path: str, params: dict = None, stop: threading.Event = None):
+        # Yields ("SYNC", items) after every (re)list, then ("ADDED" |
+        # "MODIFIED" | "DELETED", object) events. Watches resume from the
+        # last seen resourceVersion; only an expired one forces a relist.
+        stop = stop or threading.Event()
+        resource_version = None
+        failures = 0
+
+        while not stop.is_set():
+            try:
+                if resource_version is None:
+                    items, resource_version = self.list(path, params)
+                    yield "SYNC", items
+
+                for event in self.watch(path, resource_version, params):
+                    obj = event["object"]
+                    resource_version = obj.get("metadata", {}).get("resourceVersion", resource_version)
+                    if event["type"] != "BOOKMARK":
+                        yield event["type"], obj
+                    failures = 0
+                    if stop.is_set():
+                        return
+            except WatchExpired:
+                print(f"Watch on {path} expired, relisting")
+                resource_version = None
+            except Exception as e:
+                failures += 1
+                delay = self._retry_delay(min(failures, 6), None)
+                print(f"Watch on {path} failed ({e}); retrying in {delay:.1f}s")
+                stop.wait(delay)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_client() -> KubeClient:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = KubeClient()
+        return _default
+
+
+def configure(api_url: str = None, token: str = None, verify=None) -> KubeClient:
+    # Replaces the default client, e.g. from --api-url/--ca-cert arguments.
+    global _default
+    with _default_lock:
+        _default = KubeClient(api_url or API_URL, token or TOKEN, verify=VERIFY if verify is None else verify)
+        return _default
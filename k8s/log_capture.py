@@ -0,0 +1,79 @@
+import os
+import gzip
+import time
+from pathlib import Path
+
+# Saves the previous container's logs of a crash-looping pod before it is
+# deleted, so the evidence outlives the pod. Logs are streamed from the API
+# straight into gzip files, at most MAX_BYTES per pod (the server is asked for
+# no more via limitBytes, and anything past the cap is dropped locally), and a
+# capture gives up after TIMEOUT seconds so it cannot hold up the delete. Log
+# reads are never retried, and the connect and read timeouts are cut to what
+# is left of that deadline:
+#
+#   <CAPTURE_DIR>/<namespace>/<pod>/<container>-<YYYYmmdd-HHMMSS>.log.gz
+
+CAPTURE_DIR = os.getenv("LOG_CAPTURE_DIR", "crash_logs")
+MAX_BYTES = int(os.getenv("LOG_CAPTURE_MAX_BYTES", str(1024 * 1024)))
+TIMEOUT = float(os.getenv("LOG_CAPTURE_TIMEOUT", "10"))
+CHUNK_SIZE = 64 * 1024
+
+
+def restarted_containers(pod: dict) -> list:
+    # Only containers that restarted have a previous instance to read.
+    statuses = pod["status"].get("containerStatuses", [])
+    return [c["name"] for c in statuses if c.get("restartCount", 0) > 0]
+
+
+class LogCapture:
+    def __init__(self, client, directory=CAPTURE_DIR, max_bytes: int = MAX_BYTES, timeout: float = TIMEOUT):
+        self.client = client
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+
+    def capture(self, pod: dict) -> dict:
+        # Returns {"files": [...], "bytes": n, "errors": [...]}; never raises, so
+        # a failed capture does not stop the pod from being remediated.
+        meta = pod["metadata"]
+        deadline = time.monotonic() + self.timeout
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        result = {"files": [], "bytes": 0, "errors": []}
+
+        for container in restarted_containers(pod):
+            budget = self.max_bytes - result["bytes"]
+            if budget <= 0 or time.monotonic() >= deadline:
+                result["errors"].append(f"{container}: skipped, pod cap or timeout reached")
+                continue
+            path = self.directory / meta["namespace"] / meta["name"] / f"{container}-{stamp}.log.gz"
+            try:
+                written = self.stream(meta["namespace"], meta["name"], container, path, budget, deadline)
+            except Exception as e:
+                result["errors"].append(f"{container}: {e}")
+                continue
+            result["bytes"] += written
+            result["files"].append(str(path))
+
+        return result
+
+    def stream(self, ns, name, container, path, budget, deadline) -> int:
+        remaining = max(0.1, deadline - time.monotonic())
+        r = self.client.get(
+            f"/api/v1/namespaces/{ns}/pods/{name}/log",
+            params={"previous": "true", "container": container, "limitBytes": budget},
+            stream=True,
+            retries=0,
+            timeout=(min(self.client.timeout, remaining), remaining),
+        )
+        with r:
+            r.raise_for_status()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            written = 0
+            with gzip.open(path, "wb") as f:
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    chunk = chunk[:budget - written]
+                    f.write(chunk)
+                    written += len(chunk)
+                    if written >= budget or time.monotonic() >= deadline:
+                        break
+        return written
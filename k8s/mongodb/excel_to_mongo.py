@@ -1,11 +1,14 @@
 import os
 import sys
-import pandas as pd
+import time
+from openpyxl import load_workbook
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
 
 MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB = os.getenv("MONGO_DB")
 MONGO_COLLECTION = os.getenv("MONGO_COLLECTION")
+BATCH_SIZE = max(1, int(os.getenv("BATCH_SIZE", "1000")))
 
 if not all([MONGO_URI, MONGO_DB, MONGO_COLLECTION]):
     raise SystemExit("MongoDB secrets are missing")
@@ -15,13 +18,64 @@ if len(sys.argv) != 2:
 
 excel_file = sys.argv[1]
 
-df = pd.read_excel(excel_file)
-df = df.where(pd.notnull(df), None)
 
-records = df.to_dict("records")
+def column_names(header):
+    # Same names pandas gives: "Unnamed: i" for blanks, ".n" suffixes for repeats.
+    names, seen = [], {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+# read_only streams rows from the file, so memory depends on BATCH_SIZE
+# rather than on the size of the sheet.
+workbook = load_workbook(excel_file, read_only=True, data_only=True)
+rows = workbook.worksheets[0].iter_rows(values_only=True)
+columns = column_names(next(rows, ()))
 
 client = MongoClient(MONGO_URI)
 collection = client[MONGO_DB][MONGO_COLLECTION]
 
-result = collection.insert_many(records)
-print(f"Inserted {len(result.inserted_ids)} documents")
+inserted = failed = 0
+start = time.perf_counter()
+
+
+def flush(batch):
+    global inserted, failed
+    try:
+        inserted += len(collection.insert_many(batch, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        errors = e.details["writeErrors"]
+        inserted += e.details["nInserted"]
+        failed += len(errors)
+        if errors:
+            print(f"{len(errors)} documents rejected, first: {errors[0]['errmsg']}")
+    elapsed = time.perf_counter() - start
+    print(f"Inserted {inserted} documents ({inserted / elapsed:.0f}/s)", flush=True)
+
+
+batch = []
+for row in rows:
+    if all(value is None for value in row):
+        continue
+    batch.append(dict(zip(columns, row)))
+    if len(batch) >= BATCH_SIZE:
+        flush(batch)
+        batch = []
+
+if batch:
+    flush(batch)
+
+workbook.close()
+
+elapsed = time.perf_counter() - start
+print(f"Inserted {inserted} documents in {elapsed:.1f}s" + (f", {failed} failed" if failed else ""))
+
+if failed:
+    sys.exit(1)
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+from informer import controller_of
+
+# Deletes crash-looping pods through the API, grouped by the controller that
+# owns them (ReplicaSet, StatefulSet, ...). Each owner may lose at most
+# MAX_PER_OWNER pods per OWNER_WINDOW seconds, so a bad rollout is not turned
+# into a delete storm, and a pod that was just deleted is left alone for
+# COOLDOWN seconds. Both are persisted in STATE_FILE so they hold across runs.
+# With a LogCapture, each pod's previous logs are saved right before its own
+# delete, inside the same concurrent task, so no delete waits on other pods.
+
+WORKERS = max(1, int(os.getenv("REMEDIATION_WORKERS", "16")))
+MAX_PER_OWNER = int(os.getenv("REMEDIATION_MAX_PER_OWNER", "3"))
+OWNER_WINDOW = float(os.getenv("REMEDIATION_OWNER_WINDOW", "300"))
+COOLDOWN = float(os.getenv("REMEDIATION_COOLDOWN", "600"))
+STATE_FILE = Path(os.getenv("REMEDIATION_STATE", ".remediation_state.json"))
+
+
+def pod_key(pod: dict) -> str:
+    return f"{pod['metadata']['namespace']}/{pod['metadata']['name']}"
+
+
+def owner_key(pod: dict) -> str:
+    # "ns/Kind/name" of the controlling owner; an unowned pod is its own owner.
+    meta = pod["metadata"]
+    return "/".join(controller_of(pod) or (meta["namespace"], "Pod", meta["name"]))
+
+
+class Remediator:
+    def __init__(self, client, dry_run: bool = False, state_path: Path = STATE_FILE,
+                 max_per_owner: int = MAX_PER_OWNER, owner_window: float = OWNER_WINDOW,
+                 cooldown: float = COOLDOWN, workers: int = WORKERS, capture=None):
+        self.client = client
+        self.dry_run = dry_run
+        self.capture = capture
+        self.state_path = Path(state_path)
+        self.max_per_owner = max_per_owner
+        self.owner_window = owner_window
+        self.cooldown = cooldown
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.state = self.load_state()
+
+    def load_state(self) -> dict:
+        if not self.state_path.exists():
+            return {"pods": {}, "owners": {}}
+        with self.state_path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_state(self):
+        now = time.time()
+        # Forget entries that no longer affect any decision.
+        self.state["pods"] = {k: t for k, t in self.state["pods"].items() if now - t < self.cooldown}
+        self.state["owners"] = {
+            k: recent for k, times in self.state["owners"].items()
+            if (recent := [t for t in times if now - t < self.owner_window])
+        }
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_path)
+
+    def plan(self, pods: list) -> dict:
+        # {owner: {"delete": [pod], "skipped": [(pod key, reason)]}}
+        now = time.time()
+        groups = defaultdict(list)
+        for pod in pods:
+            groups[owner_key(pod)].append(pod)
+
+        plan = {}
+        for owner, members in sorted(groups.items()):
+            recent = [t for t in self.state["owners"].get(owner, []) if now - t < self.owner_window]
+            budget = max(0, self.max_per_owner - len(recent))
+            entry = plan[owner] = {"delete": [], "skipped": []}
+
+            for pod in sorted(members, key=pod_key):
+                key = pod_key(pod)
+                last = self.state["pods"].get(key)
+                if last is not None and now - last < self.cooldown:
+                    entry["skipped"].append((key, f"cooldown, deleted {int(now - last)}s ago"))
+                elif budget == 0:
+                    entry["skipped"].append((key, f"owner limit of {self.max_per_owner} per {self.owner_window:g}s"))
+                else:
+                    entry["delete"].append(pod)
+                    budget -= 1
+        return plan
+
+    def delete(self, pod: dict):
+        meta = pod["metadata"]
+        r = self.client.delete(f"/api/v1/namespaces/{meta['namespace']}/pods/{meta['name']}")
+        if r.status_code == 404:
+            return "gone"
+        r.raise_for_status()
+        return "deleted"
+
+    def capture_and_delete(self, pod: dict):
+        logs = self.capture.capture(pod) if self.capture else None
+        return self.delete(pod), logs
+
+    def remediate(self, pods: list) -> dict:
+        with self.lock:
+            plan = self.plan(pods)
+            targets = [(owner, pod) for owner, entry in plan.items() for pod in entry["delete"]]
+            results = {}
+            logs = {}
+
+            if not self.dry_run and targets:
+                async def run():
+                    async for (owner, pod), result, error in self.client.fan_out(
+                        lambda item: self.capture_and_delete(item[1]), targets, self.workers
+                    ):
+                        if error is not None:
+                            results[pod_key(pod)] = f"failed: {error}"
+                        else:
+                            results[pod_key(pod)], logs[pod_key(pod)] = result
+                            now = time.time()
+                            self.state["pods"][pod_key(pod)] = now
+                            self.state["owners"].setdefault(owner, []).append(now)
+
+                asyncio.run(run())
+                self.save_state()
+
+            return {
+                owner: {
+                    "crashing": len(entry["delete"]) + len(entry["skipped"]),
+                    "delete": [
+                        {
+                            "pod": pod_key(p),
+                            "result": results.get(pod_key(p), "dry-run" if self.dry_run else ""),
+                            **({"logs": logs[pod_key(p)]} if logs.get(pod_key(p)) else {}),
+                        }
+                        for p in entry["delete"]
+                    ],
+                    "skipped": [{"pod": key, "reason": reason} for key, reason in entry["skipped"]],
+                }
+                for owner, entry in plan.items()
+            }
+
+
+def print_report(report: dict):
+    deleted = skipped = 0
+    for owner, entry in report.items():
+        print(f"{owner}: {entry['crashing']} crashing")
+        for item in entry["delete"]:
+            logs = item.get("logs")
+            saved = f" (logs: {len(logs['files'])} file(s), {logs['bytes'] // 1024} KiB)" if logs else ""
+            print(f"  - {item['pod']}: {item['result']}{saved}")
+            for error in (logs or {}).get("errors", []):
+                print(f"    log capture: {error}")
+            deleted += 1
+        for item in entry["skipped"]:
+            print(f"  = {item['pod']}: skipped ({item['reason']})")
+            skipped += 1
+    print(f"{len(report)} owners, {deleted} pods selected for deletion, {skipped} skipped")
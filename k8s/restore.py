@@ -1,18 +1,202 @@
-
-import subprocess
+import os
 import json
+import time
+import asyncio
+import argparse
+from fnmatch import fnmatch
+
+from kube_client import configure
+from informer import Informer
+from scale_down_all_deployments import BACKUP_FILE, JOURNAL_FILE, KINDS, backup_key, load_journal, scale
+
+# Restores replica counts saved by scale_down_all_deployments.py in waves.
+# A waves file (JSON or YAML) lists them in order; every object goes into the
+# first wave with a matching rule, anything unmatched into a final wave:
+#
+#   waves:
+#     - name: databases
+#       match:
+#         - labels: {tier: db}
+#         - namespace: "postgres-*"
+#     - name: backends
+#       match:
+#         - namespace: "team-*"
+#           kind: statefulset
+#
+# Each wave is scaled concurrently; readiness is followed through a watch and
+# the next wave only starts once every object in the current one is Ready.
+
+WORKERS = max(1, int(os.getenv("RESTORE_WORKERS", "16")))
+WAVE_TIMEOUT = float(os.getenv("RESTORE_WAVE_TIMEOUT", "600"))
+
+
+def load_backup():
+    backup = {}
+    if os.path.exists(BACKUP_FILE):
+        with open(BACKUP_FILE) as f:
+            backup = json.load(f)
+
+    # An interrupted scale-down leaves only its journal behind.
+    if os.path.exists(JOURNAL_FILE):
+        for (ns, kind, name), replicas in load_journal().items():
+            backup.setdefault(ns, {})[backup_key(kind, name)] = replicas
+
+    entries = []
+    for ns, workloads in backup.items():
+        for key, replicas in workloads.items():
+            # Statefulsets are stored as "statefulset/<name>".
+            kind, _, name = key.rpartition("/")
+            entries.append((ns, kind or "deployment", name, replicas))
+    return entries
+
+
+def load_waves(path):
+    if not path:
+        return []
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+            config = yaml.safe_load(f)
+        else:
+            config = json.load(f)
+    return config.get("waves", []) if isinstance(config, dict) else config
+
+
+def rule_matches(rule, ns, kind, name, labels):
+    return (
+        fnmatch(ns, rule.get("namespace", "*"))
+        and kind == rule.get("kind", kind)
+        and fnmatch(name, rule.get("name", "*"))
+        and all(labels.get(k) == str(v) for k, v in rule.get("labels", {}).items())
+    )
+
+
+def plan_waves(entries, waves, lookup):
+    planned = [(wave.get("name", f"wave-{i + 1}"), []) for i, wave in enumerate(waves)]
+    rest = ("remaining", [])
+
+    for entry in entries:
+        ns, kind, name, _ = entry
+        labels = (lookup((ns, kind, name)) or {}).get("metadata", {}).get("labels", {})
+        for (_, members), wave in zip(planned, waves):
+            if any(rule_matches(rule, ns, kind, name, labels) for rule in wave.get("match", [])):
+                members.append(entry)
+                break
+        else:
+            rest[1].append(entry)
+
+    return [wave for wave in planned + [rest] if wave[1]]
+
+
+def is_ready(obj, min_generation):
+    meta, spec, status = obj["metadata"], obj.get("spec", {}), obj.get("status", {})
+    generation = meta.get("generation", 0)
+    if generation < min_generation or status.get("observedGeneration", 0) < generation:
+        return False
+    replicas = spec.get("replicas", 1)
+    return status.get("readyReplicas", 0) >= replicas and status.get("updatedReplicas", replicas) >= replicas
+
+
+class ReadinessTracker:
+    # One informer per kind keeps every deployment and statefulset current
+    # through a watch.
+
+    def __init__(self, client):
+        self.informers = {kind: Informer(client, resource) for kind, resource in KINDS.items()}
+
+    def start(self):
+        for informer in self.informers.values():
+            informer.start()
+
+    def stop(self):
+        for informer in self.informers.values():
+            informer.stop.set()
+
+    def get(self, key):
+        ns, kind, name = key
+        return self.informers[kind].get(ns, name)
+
+    def wait_ready(self, generations, timeout):
+        # Returns the keys that are still not Ready when the timeout expires.
+        deadline = time.monotonic() + timeout
+        for kind, informer in self.informers.items():
+            wanted = {(ns, name): g for (ns, k, name), g in generations.items() if k == kind}
+
+            def ready(inf):
+                return all(
+                    (obj := inf.get(*key)) is not None and is_ready(obj, generation)
+                    for key, generation in wanted.items()
+                )
+
+            informer.wait_for(ready, max(0.0, deadline - time.monotonic()))
+
+        return [key for key, generation in generations.items()
+                if (obj := self.get(key)) is None or not is_ready(obj, generation)]
+
+
+def restore_wave(client, entries, workers):
+    # Returns ({key: generation to wait for}, [keys that failed to scale]).
+    generations = {}
+    failed = []
+
+    async def run():
+        async for (ns, kind, name, replicas), generation, error in client.fan_out(
+            lambda e: scale(client, *e), entries, workers
+        ):
+            if error is not None:
+                print(f"  Failed to restore {kind} {ns}/{name}: {error}")
+                failed.append((ns, kind, name))
+            else:
+                generations[(ns, kind, name)] = generation
+
+    asyncio.run(run())
+    return generations, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Restore replica counts saved by scale_down_all_deployments.py")
+    parser.add_argument("--waves", help="JSON or YAML file with the restore waves")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="concurrent scale requests")
+    parser.add_argument("--wave-timeout", type=float, default=WAVE_TIMEOUT, help="seconds to wait for a wave")
+    parser.add_argument("--api-url", help="Kubernetes API URL (default: KUBE_API_URL or kubectl proxy)")
+    parser.add_argument("--dry-run", action="store_true", help="print the waves without scaling")
+    args = parser.parse_args()
+
+    client = configure(args.api_url)
+    entries = load_backup()
+
+    tracker = ReadinessTracker(client)
+    tracker.start()
+    waves = plan_waves(entries, load_waves(args.waves), tracker.get)
+
+    start = time.perf_counter()
+    for number, (name, members) in enumerate(waves, 1):
+        print(f"Wave {number}/{len(waves)} '{name}': {len(members)} objects")
+
+        if args.dry_run:
+            for ns, kind, obj_name, replicas in members:
+                print(f"  {kind} {ns}/{obj_name} → {replicas}")
+            continue
+
+        missing = [e for e in members if tracker.get(e[:3]) is None]
+        for ns, kind, obj_name, _ in missing:
+            print(f"  Skipping {kind} {ns}/{obj_name}: not found")
+
+        wave_start = time.perf_counter()
+        generations, failed = restore_wave(client, [e for e in members if e not in missing], args.workers)
+        pending = failed + tracker.wait_ready(generations, args.wave_timeout)
+
+        if pending:
+            for ns, kind, obj_name in pending:
+                print(f"  Not ready: {kind} {ns}/{obj_name}")
+            raise SystemExit(f"Wave '{name}' not ready after {args.wave_timeout:g}s; later waves were not started")
+
+        print(f"  Ready in {time.perf_counter() - wave_start:.1f}s")
+
+    tracker.stop()
+    if not args.dry_run:
+        print(f"Restore finished in {time.perf_counter() - start:.1f}s")
+
 
-with open("replica_backup.json") as f:
-    backup = json.load(f)
-
-for ns, deployments in backup.items():
-    for name, replicas in deployments.items():
-        print(f"Restoring {ns}/{name} → {replicas}")
-        subprocess.run(
-            [
-                "kubectl", "scale", "deployment", name,
-                f"--replicas={replicas}",
-                "-n", ns
-            ],
-            check=True
-        )
+if __name__ == "__main__":
+    main()
@@ -1,70 +1,139 @@
-import subprocess
+import os
 import json
+import asyncio
+import argparse
 
-BACKUP_FILE = "replica_backup.json"
-
+from kube_client import configure
+from informer import Informer
 
-def run_cmd(cmd):
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True
+BACKUP_FILE = "replica_backup.json"
+# Replica counts are appended here before anything is scaled, so an
+# interrupted run can be resumed (or restored) without losing the originals.
+JOURNAL_FILE = "replica_backup.ndjson"
+WORKERS = max(1, int(os.getenv("SCALE_WORKERS", "16")))
+
+# Backup kind -> informer resource.
+KINDS = {
+    "deployment": "deployments",
+    "statefulset": "statefulsets",
+}
+
+
+def backup_key(kind, name):
+    # Deployments keep the plain name used by older backups.
+    return name if kind == "deployment" else f"{kind}/{name}"
+
+
+def load_journal():
+    journal = {}
+    if not os.path.exists(JOURNAL_FILE):
+        return journal
+
+    with open(JOURNAL_FILE, "rb+") as f:
+        offset = 0
+        for line in f:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("incomplete line")
+                entry = json.loads(line)
+            except ValueError:
+                # Torn last write from an interrupted run; drop it so new
+                # entries start on a clean line.
+                f.truncate(offset)
+                break
+            offset += len(line)
+            journal.setdefault((entry["namespace"], entry["kind"], entry["name"]), entry["replicas"])
+
+    return journal
+
+
+def append_journal(entries):
+    with open(JOURNAL_FILE, "a") as f:
+        for ns, kind, name, replicas in entries:
+            f.write(json.dumps({"namespace": ns, "kind": kind, "name": name, "replicas": replicas}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def get_workloads(client):
+    workloads = []
+    for kind, resource in KINDS.items():
+        for item in Informer(client, resource).sync().list():
+            meta = item["metadata"]
+            workloads.append((meta["namespace"], kind, meta["name"], item["spec"].get("replicas", 0)))
+    return workloads
+
+
+def scale(client, ns, kind, name, replicas):
+    # Setting an absolute replica count is safe to retry. Returns the new
+    # generation, which restore.py waits for the controller to observe.
+    r = client.patch(
+        f"/apis/apps/v1/namespaces/{ns}/{kind}s/{name}",
+        {"spec": {"replicas": replicas}},
+        idempotent=True,
     )
+    r.raise_for_status()
+    return r.json()["metadata"].get("generation", 0)
 
-    if result.returncode != 0:
-        raise RuntimeError(result.stderr)
-
-    return result.stdout
-
-
-def get_namespaces():
-    output = run_cmd(["kubectl", "get", "ns", "-o", "json"])
-    data = json.loads(output)
-    return [ns["metadata"]["name"] for ns in data["items"]]
 
+def scale_all(client, targets, workers):
+    failed = []
 
-def get_deployments(namespace):
-    output = run_cmd(
-        ["kubectl", "get", "deploy", "-n", namespace, "-o", "json"]
-    )
-    return json.loads(output)["items"]
-
+    async def run():
+        async for (ns, kind, name), _, error in client.fan_out(
+            lambda t: scale(client, *t, 0), targets, workers
+        ):
+            if error is not None:
+                print(f"Failed to scale {kind} {ns}/{name}: {error}")
+                failed.append((ns, kind, name))
 
-def scale_deployment(namespace, name, replicas):
-    run_cmd([
-        "kubectl", "scale", "deployment", name,
-        f"--replicas={replicas}",
-        "-n", namespace
-    ])
+    asyncio.run(run())
+    return failed
 
 
 def main():
-    backup = {}
+    parser = argparse.ArgumentParser(description="Scale every deployment and statefulset to 0, keeping a backup")
+    parser.add_argument("--api-url", help="Kubernetes API URL (default: KUBE_API_URL or kubectl proxy)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="concurrent scale requests")
+    args = parser.parse_args()
 
-    namespaces = get_namespaces()
+    client = configure(args.api_url)
 
-    for ns in namespaces:
-        deployments = get_deployments(ns)
+    journal = load_journal()
+    if journal:
+        print(f"Resuming: {len(journal)} objects already recorded in {JOURNAL_FILE}")
 
-        if not deployments:
-            continue
+    workloads = get_workloads(client)
 
-        backup[ns] = {}
+    # Objects recorded by an earlier run keep their original count, even if
+    # they are already at 0 now.
+    new = [(ns, kind, name, replicas) for ns, kind, name, replicas in workloads
+           if (ns, kind, name) not in journal]
+    append_journal(new)
+    journal.update({(ns, kind, name): replicas for ns, kind, name, replicas in new})
 
-        for d in deployments:
-            name = d["metadata"]["name"]
-            replicas = d["spec"].get("replicas", 0)
+    targets = []
+    for ns, kind, name, replicas in workloads:
+        if replicas != 0:
+            print(f"Scaling {kind} {ns}/{name}: {replicas} → 0")
+            targets.append((ns, kind, name))
 
-            print(f"Scaling {ns}/{name}: {replicas} → 0")
+    failed = scale_all(client, targets, args.workers)
 
-            backup[ns][name] = replicas
-            scale_deployment(ns, name, 0)
+    backup = {}
+    for (ns, kind, name), replicas in sorted(journal.items()):
+        backup.setdefault(ns, {})[backup_key(kind, name)] = replicas
 
     with open(BACKUP_FILE, "w") as f:
         json.dump(backup, f, indent=2)
 
     print("\nBackup written to", BACKUP_FILE)
 
+    if failed:
+        raise SystemExit(f"{len(failed)} objects could not be scaled; rerun to resume")
+
+    os.remove(JOURNAL_FILE)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+from collections import defaultdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Shared plumbing for the in-process fake APIs (Grafana/fake_grafana.py,
+# k8s/fake_apiserver.py) and their benchmarks: per-endpoint request
+# accounting, the HTTP handler with the /__bench/stats and /__bench/reset
+# endpoints, and timing a script run in a subprocess.
+
+
+class FakeServer:
+    # Subclasses set self.latency (seconds) and self.rng, and implement
+    # respond(handler, method, path, query, body) -> (key, status, payload).
+    # payload is JSON-encoded unless it is bytes (sent as text/plain); key
+    # None skips accounting. respond() returns None when it has written the
+    # response itself (e.g. a streaming watch).
+
+    def __init__(self):
+        self.stats_lock = threading.Lock()
+        self.samples = []
+        self.requests = defaultdict(int)
+
+    # --- request accounting -------------------------------------------------
+
+    def record(self, key: str, elapsed: float):
+        with self.stats_lock:
+            self.samples.append(elapsed)
+            self.requests[key] += 1
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            ordered = sorted(self.samples)
+            pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+            return {
+                "requests": len(ordered),
+                "p50_ms": round(pick(0.50) * 1000, 2),
+                "p99_ms": round(pick(0.99) * 1000, 2),
+                "by_endpoint": dict(self.requests),
+            }
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.samples = []
+            self.requests = defaultdict(int)
+
+    # --- server -------------------------------------------------------------
+
+    def respond(self, handler, method: str, path: str, query: dict, body):
+        raise NotImplementedError
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def handle_any(self):
+                start = time.perf_counter()
+                url = urlparse(self.path)
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                body = None
+                if raw:
+                    if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+                        body = {k: v[0] for k, v in parse_qs(raw.decode()).items()}
+                    else:
+                        body = json.loads(raw)
+
+                if fake.latency:
+                    time.sleep(fake.rng.uniform(0.5, 1.5) * fake.latency)
+
+                if url.path == "/__bench/stats":
+                    result = None, 200, fake.stats()
+                elif url.path == "/__bench/reset":
+                    fake.reset_stats()
+                    result = None, 200, {}
+                else:
+                    result = fake.respond(self, self.command, url.path, parse_qs(url.query), body)
+                    if result is None:
+                        return
+                key, status, payload = result
+
+                if isinstance(payload, bytes):
+                    data, content_type = payload, "text/plain"
+                else:
+                    data, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                if status == 503:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+                if key is not None:
+                    fake.record(f"{self.command} {key}", time.perf_counter() - start)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = handle_any
+
+        return Handler
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+        # Serves from a background thread; for tests and benchmarks.
+        server = ThreadingHTTPServer((host, port), self.handler())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def serve_forever(self, host: str, port: int):
+        server = ThreadingHTTPServer((host, port), self.handler())
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def run_script(script, args, env: dict, workdir) -> tuple:
+    # Returns (exit code, seconds, peak RSS in MiB, stderr).
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, str(script), *args],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    stderr = proc.stderr.read()
+    _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux.
+    return os.waitstatus_to_exitcode(status), elapsed, rusage.ru_maxrss / 1024, stderr.decode(errors="replace")
@@ -1,14 +1,246 @@
-import requests
 import os
+import re
+import atexit
+import time
+import random
+import asyncio
+import threading
+import requests
+import urllib3
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+
+MAX_CONCURRENCY = max(1, int(os.getenv("GRAFANA_MAX_CONCURRENCY", "8")))
+RETRIES = int(os.getenv("GRAFANA_RETRIES", "5"))
+TIMEOUT = float(os.getenv("GRAFANA_TIMEOUT", "30"))
+PRINT_STATS = os.getenv("GRAFANA_CLIENT_STATS", "").lower() in ("1", "true", "yes")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+MAX_BACKOFF = 30.0
+LATENCY_SAMPLES = 10000
+
+# Collapse ids in paths so latency is aggregated per endpoint, not per object.
+ENDPOINT_PATTERNS = [
+    (re.compile(r"/api/dashboards/uid/[^/]+"), "/api/dashboards/uid/{uid}"),
+    (re.compile(r"/api/datasources/proxy/[^/]+"), "/api/datasources/proxy/{id}"),
+    (re.compile(r"/api/folders/[^/]+"), "/api/folders/{uid}"),
+    (re.compile(r"/folder/[^/]+/rule-groups/[^/]+"), "/folder/{uid}/rule-groups/{group}"),
+    (re.compile(r"/alert-rules/[^/]+"), "/alert-rules/{uid}"),
+]
+
+
+def endpoint_key(path: str) -> str:
+    path = path.split("?", 1)[0]
+    for pattern, replacement in ENDPOINT_PATTERNS:
+        path = pattern.sub(replacement, path)
+    return path
+
+
+def env_verify(prefix: str = "GRAFANA"):
+    # requests' verify from <prefix>_CA_CERT / <prefix>_INSECURE: a CA bundle
+    # path, True for the system CAs, or False.
+    if os.getenv(f"{prefix}_INSECURE", "").lower() in ("1", "true", "yes"):
+        return False
+    return os.getenv(f"{prefix}_CA_CERT") or True
+
+
+def percentile(samples, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class GrafanaClient:
+    # Subclasses for other APIs override this to aggregate their own paths.
+    endpoint_key = staticmethod(endpoint_key)
+    api_name = "GRAFANA"
+
+    def __init__(
+        self,
+        url: str,
+        token: str,
+        max_concurrency: int = MAX_CONCURRENCY,
+        retries: int = RETRIES,
+        backoff: float = 0.5,
+        timeout: float = TIMEOUT,
+        verify=True,
+    ):
+        self.base_url = url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.verify = verify
+        if verify is False:
+            # Verification was turned off on purpose; don't warn on every call.
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        })
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {"count": 0, "errors": 0, "retries": 0, "total": 0.0})
+        self._samples = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+
+    @classmethod
+    def from_env(cls, prefix: str = "GRAFANA", **kwargs):
+        url = os.getenv(f"{prefix}_URL")
+        token = os.getenv(f"{prefix}_TOKEN")
+        if not url or not token:
+            raise SystemExit(f"{prefix}_URL and {prefix}_TOKEN must be set")
+        kwargs.setdefault("verify", env_verify(prefix))
+        return cls(url, token, **kwargs)
+
+    def _retry_delay(self, attempt: int, response) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(MAX_BACKOFF, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    when = parsedate_to_datetime(retry_after).timestamp()
+                    return min(MAX_BACKOFF, max(0.0, when - time.time()))
+                except (TypeError, ValueError):
+                    pass
+        return min(MAX_BACKOFF, self.backoff * 2 ** attempt) * (0.5 + random.random() / 2)
+
+    def _record(self, key: str, elapsed: float, error: bool, retried: bool):
+        with self._lock:
+            stats = self._stats[key]
+            stats["count"] += 1
+            stats["errors"] += error
+            stats["retries"] += retried
+            stats["total"] += elapsed
+            self._samples[key].append(elapsed)
+
+    def request(self, method: str, path: str, endpoint: str = None, idempotent: bool = None,
+                retries: int = None, **kwargs):
+        # 429 is always retried (the server did not process the request);
+        # 5xx and connection errors only when the call is safe to repeat.
+        # retries overrides the client's count for one call (0: single attempt).
+        method = method.upper()
+        retries = self.retries if retries is None else retries
+        url = path if path.startswith(("http://", "https://")) else self.base_url + path
+        key = f"{method} {endpoint or self.endpoint_key(path)}"
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("verify", self.verify)
+
+        for attempt in range(retries + 1):
+            response = error = None
+            start = time.perf_counter()
+            with self._slots:
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+            elapsed = time.perf_counter() - start
+
+            failed = error is not None or response.status_code >= 400
+            retryable = (
+                (response is not None and response.status_code == 429)
+                or (idempotent and (error is not None or response.status_code in RETRY_STATUSES))
+            )
+            last = attempt == retries or not retryable
+            self._record(key, elapsed, failed, not last)
+
+            if last:
+                if error is not None:
+                    raise error
+                return response
+
+            time.sleep(self._retry_delay(attempt, response))
+
+    def get(self, path: str, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path: str, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path: str, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    def get_json(self, path: str, **kwargs):
+        r = self.get(path, **kwargs)
+        r.raise_for_status()
+        return r.json()
+
+    async def arequest(self, method: str, path: str, **kwargs):
+        return await asyncio.to_thread(self.request, method, path, **kwargs)
+
+    async def aget_json(self, path: str, **kwargs):
+        return await asyncio.to_thread(self.get_json, path, **kwargs)
+
+    async def fan_out(self, fn, items, limit: int = None):
+        # Runs fn(item) for every item with at most `limit` in flight and
+        # yields (item, result, error) as each one completes.
+        limit = limit or self.max_concurrency
+        sem = asyncio.Semaphore(limit)
+        loop = asyncio.get_running_loop()
+
+        # A dedicated pool so the default executor's size does not cap `limit`.
+        with ThreadPoolExecutor(max_workers=limit) as pool:
+            async def run(item):
+                async with sem:
+                    try:
+                        return item, await loop.run_in_executor(pool, fn, item), None
+                    except Exception as e:
+                        return item, None, e
+
+            for next_done in asyncio.as_completed([run(item) for item in items]):
+                yield await next_done
+
+    def latency_stats(self) -> dict:
+        with self._lock:
+            return {
+                key: {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "retries": stats["retries"],
+                    "avg_ms": round(1000 * stats["total"] / stats["count"], 2),
+                    "p50_ms": round(1000 * percentile(self._samples[key], 0.50), 2),
+                    "p99_ms": round(1000 * percentile(self._samples[key], 0.99), 2),
+                }
+                for key, stats in sorted(self._stats.items())
+            }
+
+    def print_stats(self):
+        print(f"\n--- {self.api_name} API LATENCY ---")
+        for key, s in self.latency_stats().items():
+            print(
+                f"{key}: n={s['count']} avg={s['avg_ms']}ms p50={s['p50_ms']}ms "
+                f"p99={s['p99_ms']}ms errors={s['errors']} retries={s['retries']}"
+            )
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_client() -> GrafanaClient:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = GrafanaClient.from_env()
+            if PRINT_STATS:
+                atexit.register(_default.print_stats)
+        return _default
 
-SESSION = requests.Session()
-SESSION.headers.update({
-    "Authorization": f"Bearer {os.getenv('GRAFANA_TOKEN')}",
-    "Content-Type": "application/json"
-})
 
 def api_get(path):
-    url = os.getenv("GRAFANA_URL").rstrip("/") + path
-    r = SESSION.get(url)
-    r.raise_for_status()
-    return r.json()
+    return default_client().get_json(path)
@@ -0,0 +1,113 @@
+import re
+import json
+
+# Parsing helpers shared by the Grafana scripts: a streaming JSON decoder for
+# large exports and API responses, and Grafana/Prometheus duration strings.
+
+DECODER = json.JSONDecoder()
+WHITESPACE = re.compile(r"\s*")
+SCALAR_TAIL = re.compile(r"[\w.+-]*")
+DURATION = re.compile(r"(\d+)(ms|[smhdwy])")
+DURATIONS = re.compile(r"(?:\d+(?:ms|[smhdwy]))+")
+SECONDS = re.compile(r"\d+(?:\.\d+)?")
+UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800, "y": 31536000}
+
+
+def parse_duration(text: str) -> float:
+    # "1h30m" -> 5400.0; a bare number (Grafana's "60" intervals) is seconds.
+    # Raises ValueError for anything else, e.g. "1.5m".
+    text = text.strip()
+    if SECONDS.fullmatch(text):
+        return float(text)
+    if not DURATIONS.fullmatch(text):
+        raise ValueError(f"Invalid duration: {text!r}")
+    return float(sum(int(n) * UNITS[unit] for n, unit in DURATION.findall(text)))
+
+
+class JsonStream:
+    # Incrementally decodes JSON from an iterable of text chunks, holding at
+    # most one decoded value plus one chunk in memory.
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buf, self.pos = "", 0
+
+    def fill(self, at_least: int = 1) -> bool:
+        # Appends chunks until at_least more characters are buffered; False
+        # if the input ended before any arrived.
+        parts, size = [self.buf[self.pos:]], 0
+        while size < at_least:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            size += len(chunk)
+        self.buf, self.pos = "".join(parts), 0
+        return size > 0
+
+    def peek(self) -> str:
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of input")
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if c not in chars:
+            raise ValueError(f"Expected one of {chars!r} at offset {self.pos}, got {c!r}")
+        self.pos += 1
+        return c
+
+    def decode(self):
+        self.peek()
+        while True:
+            # A failed attempt at least doubles the buffered text before the
+            # next one, so a value spanning many chunks is decoded O(n) times
+            # in total rather than once per chunk.
+            try:
+                value, end = DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill(len(self.buf) - self.pos):
+                    raise
+                continue
+            # A number (or literal) is only complete once something other than
+            # number characters follows it: "1." or "22" at the buffer end may
+            # continue in the next chunk.
+            if (self.buf[self.pos] not in '{["'
+                    and SCALAR_TAIL.match(self.buf, end).end() == len(self.buf) and self.fill()):
+                continue
+            self.pos = end
+            return value
+
+    def array_items(self):
+        # Yields the elements of the array starting at the current position.
+        self.expect("[")
+        if self.peek() == "]":
+            self.expect("]")
+            return
+        while True:
+            yield self.decode()
+            if self.expect(",]") == "]":
+                return
+
+
+def iter_json_array(chunks):
+    # [item, ...] -> item, ...
+    yield from JsonStream(chunks).array_items()
+
+
+def iter_json_object_arrays(chunks):
+    # {"key": [item, ...], ...} -> (key, item), ...
+    stream = JsonStream(chunks)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.decode()
+        stream.expect(":")
+        for item in stream.array_items():
+            yield key, item
+        if stream.expect(",}") == "}":
+            return
@@ -1,16 +1,273 @@
+import os
+import sys
 import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from xml.sax.saxutils import quoteattr, escape
 
 REQUIRED_KEYS = ["title", "panels"]
 
-for path in Path("dashboards_raw").glob("*.json"):
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+DATASOURCE_REF = {
+    "anyOf": [
+        {"type": "null"},
+        {"type": "string"},
+        {"type": "object", "properties": {"uid": {"type": "string"}, "type": {"type": "string"}}},
+    ]
+}
 
-    dashboard = data.get("dashboard", data)
-    missing = [k for k in REQUIRED_KEYS if k not in dashboard]
+SCHEMA = {
+    "type": "object",
+    "required": REQUIRED_KEYS,
+    "properties": {
+        "title": {"type": "string", "minLength": 1},
+        "uid": {"type": "string"},
+        "panels": {"type": "array", "items": {"$ref": "panel"}},
+    },
+    "definitions": {
+        "panel": {
+            "type": "object",
+            "required": ["type"],
+            "properties": {
+                "id": {"type": "integer"},
+                "type": {"type": "string", "minLength": 1},
+                "title": {"type": "string"},
+                "gridPos": {"type": "object", "required": ["h", "w", "x", "y"]},
+                "datasource": {"$ref": "datasource"},
+                "targets": {"type": "array", "items": {"$ref": "target"}},
+                # Collapsed rows carry their children here.
+                "panels": {"type": "array", "items": {"$ref": "panel"}},
+            },
+        },
+        "target": {
+            "type": "object",
+            "properties": {
+                "refId": {"type": "string"},
+                "datasource": {"$ref": "datasource"},
+            },
+        },
+        "datasource": DATASOURCE_REF,
+    },
+}
 
-    if missing:
-        print(f"{path.name}: MISSING {missing}")
+TYPES = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+}
+
+# Cache entries are only reused when they were produced by the same schema.
+SCHEMA_HASH = hashlib.sha256(json.dumps(SCHEMA, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def compile_schema(schema: dict, definitions: dict, compiled: dict):
+    # Turns the subset of JSON schema used above (type, required, properties,
+    # items, anyOf, minLength, $ref to a definition) into nested closures, so
+    # each document is checked without re-interpreting the schema.
+    if "$ref" in schema:
+        name = schema["$ref"]
+        if name not in compiled:
+            compiled[name] = None  # placeholder for recursive references
+            compiled[name] = compile_schema(definitions[name], definitions, compiled)
+        return lambda value, path: compiled[name](value, path)
+
+    checks = []
+
+    if "type" in schema:
+        is_type = TYPES[schema["type"]]
+        expected = schema["type"]
+
+        def check_type(value, path):
+            if not is_type(value):
+                yield f"{path}: expected {expected}, got {type(value).__name__}"
+        checks.append((check_type, True))
+
+    if "minLength" in schema:
+        min_length = schema["minLength"]
+
+        def check_length(value, path):
+            if isinstance(value, str) and len(value) < min_length:
+                yield f"{path}: shorter than {min_length}"
+        checks.append((check_length, False))
+
+    if "required" in schema:
+        required = schema["required"]
+
+        def check_required(value, path):
+            if isinstance(value, dict):
+                missing = [k for k in required if k not in value]
+                if missing:
+                    yield f"{path}: MISSING {missing}"
+        checks.append((check_required, False))
+
+    if "properties" in schema:
+        properties = {
+            key: compile_schema(sub, definitions, compiled)
+            for key, sub in schema["properties"].items()
+        }
+
+        def check_properties(value, path):
+            if isinstance(value, dict):
+                for key, check in properties.items():
+                    if key in value:
+                        yield from check(value[key], f"{path}.{key}")
+        checks.append((check_properties, False))
+
+    if "items" in schema:
+        item_check = compile_schema(schema["items"], definitions, compiled)
+
+        def check_items(value, path):
+            if isinstance(value, list):
+                for i, item in enumerate(value):
+                    yield from item_check(item, f"{path}[{i}]")
+        checks.append((check_items, False))
+
+    if "anyOf" in schema:
+        options = [compile_schema(sub, definitions, compiled) for sub in schema["anyOf"]]
+
+        def check_any(value, path):
+            if all(any(True for _ in option(value, path)) for option in options):
+                yield f"{path}: does not match any allowed form"
+        checks.append((check_any, False))
+
+    def validate(value, path):
+        for check, stop_on_error in checks:
+            errors = list(check(value, path))
+            yield from errors
+            if errors and stop_on_error:
+                return
+
+    return validate
+
+
+VALIDATE = compile_schema(SCHEMA, SCHEMA["definitions"], {})
+
+
+def validate_raw(raw: bytes) -> list:
+    try:
+        data = json.loads(raw.decode("utf-8"))
+    except ValueError as e:
+        return [f"$: invalid JSON: {e}"]
+
+    dashboard = data.get("dashboard", data) if isinstance(data, dict) else data
+    return list(VALIDATE(dashboard, "$"))
+
+
+def check_file(path: Path, cached: dict = None) -> tuple:
+    # Runs in a worker, so hashing is spread over the pool like validation.
+    # Returns (sha256 or None if unreadable, errors, whether cached was reused).
+    try:
+        raw = path.read_bytes()
+    except OSError as e:
+        return None, [f"$: invalid JSON: {e}"], False
+    sha256 = hashlib.sha256(raw).hexdigest()
+    if cached and cached["sha256"] == sha256:
+        return sha256, cached["errors"], True
+    return sha256, validate_raw(raw), False
+
+
+def load_cache(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except ValueError:
+        return {}
+    return cache.get("files", {}) if cache.get("schema") == SCHEMA_HASH else {}
+
+
+def save_cache(path: Path, entries: dict):
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump({"schema": SCHEMA_HASH, "files": entries}, f)
+    os.replace(tmp, path)
+
+
+def junit_report(results: list) -> str:
+    failures = sum(1 for r in results if r["errors"])
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        f'<testsuite name="dashboard-schema" tests="{len(results)}" failures="{failures}">',
+    ]
+    for r in results:
+        name = quoteattr(r["file"])
+        if r["errors"]:
+            lines.append(f'  <testcase classname="dashboards" name={name}>')
+            lines.append(f'    <failure message={quoteattr(r["errors"][0])}>{escape(chr(10).join(r["errors"]))}</failure>')
+            lines.append("  </testcase>")
+        else:
+            lines.append(f'  <testcase classname="dashboards" name={name}/>')
+    lines.append("</testsuite>")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate dashboard JSON files against the dashboard schema")
+    parser.add_argument("--dir", default="dashboards_raw", help="directory of dashboard JSON files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="validation processes")
+    parser.add_argument("--format", choices=["text", "json", "junit"], default="text")
+    parser.add_argument("--output", help="write the report here instead of stdout")
+    parser.add_argument("--cache", default=".requiredkeys_cache.json", help="result cache keyed by file path and hash")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    files = sorted(p for p in Path(args.dir).glob("*.json") if not p.name.startswith("."))
+    cache_path = Path(args.cache)
+    cache = {} if args.no_cache else load_cache(cache_path)
+
+    # Keyed by resolved path: the same file name in another --dir is a
+    # different file.
+    keys = [str(path.resolve()) for path in files]
+    results = {}
+    entries = {}
+    cached = 0
+
+    if files:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            chunksize = max(1, len(files) // (4 * (args.workers or 1)))
+            checked = pool.map(check_file, files, [cache.get(key) for key in keys], chunksize=chunksize)
+            for path, key, (sha256, errors, reused) in zip(files, keys, checked):
+                results[path.name] = errors
+                cached += reused
+                if sha256 is not None:
+                    entries[key] = {"sha256": sha256, "errors": errors}
+
+    if not args.no_cache:
+        save_cache(cache_path, entries)
+
+    report = [{"file": name, "status": "FAIL" if results[name] else "OK", "errors": results[name]}
+              for name in sorted(results)]
+    failed = sum(1 for r in report if r["errors"])
+
+    if args.format == "json":
+        output = json.dumps({
+            "summary": {"files": len(report), "passed": len(report) - failed, "failed": failed,
+                        "cached": cached},
+            "results": report,
+        }, indent=2) + "\n"
+    elif args.format == "junit":
+        output = junit_report(report)
     else:
-        print(f"{path.name}: OK")
+        lines = []
+        for r in report:
+            lines.append(f"{r['file']}: {r['status']}")
+            lines.extend(f"    {e}" for e in r["errors"])
+        lines.append(f"\n{len(report)} files, {failed} failed, {cached} cached")
+        output = "\n".join(lines) + "\n"
+
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    else:
+        sys.stdout.write(output)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()